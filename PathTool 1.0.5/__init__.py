@@ -29,12 +29,26 @@ bl_info = {
 
 import bpy
 
-from .path_tool import VIEW3D_OT_select_path
+from .path_tool import (VIEW3D_OT_select_path, KEY_BINDINGS, load_event_map, parse_keys)
+from .utils import clear_caches
 from .tools import PathSelectionTool
 
 from shutil import copyfile
 import os
 
+def update_key_bindings(self, context):
+    load_event_map(self)
+
+def key_property(action):
+    """Preference with keys of tool action, comma separated"""
+    for name, handler, default, hint in KEY_BINDINGS:
+        if name == action:
+            return bpy.props.StringProperty(
+                name = hint.capitalize(),
+                default = default,
+                description = "Keys like \"ctrl+alt+Z, LEFTMOUSE:DOUBLE_CLICK\", modifiers are alt, ctrl, shift",
+                update = update_key_bindings)
+
 class PathToolPreferences(bpy.types.AddonPreferences):
     bl_idname = __name__
     # bl_idname = __package__
@@ -63,6 +77,67 @@ class PathToolPreferences(bpy.types.AddonPreferences):
         name = "Edge Width",
         default = 3.0,
         min = 1.0, max = 10.0, subtype = 'PIXEL')
+    path_search: bpy.props.EnumProperty(
+        items = [("AUTO", "Auto", "Choose search method by estimated cost"),
+                 ("ASTAR", "A*", "Search directed to target, fast for close control points"),
+                 ("BIDIRECTIONAL", "Bidirectional", "Search from both control points")],
+        name = "Path Search",
+        default = "AUTO",
+        description = "Method used to find path beetween control points")
+    face_connectivity: bpy.props.EnumProperty(
+        items = [("EDGE", "Edge", "Path goes through faces sharing edge"),
+                 ("VERTEX", "Vertex", "Path can also go through faces touching only by vertex")],
+        name = "Face Connectivity",
+        default = "EDGE",
+        description = "Which faces are neighbours for face path")
+    segment_cache_size: bpy.props.IntProperty(
+        name = "Segment Cache Size",
+        default = 256,
+        min = 1, max = 100000,
+        description = "Maximum number of path segments kept for reuse")
+    undo_steps: bpy.props.IntProperty(
+        name = "Undo Steps",
+        default = 1000,
+        min = 1, max = 100000,
+        description = "Number of path changes which can be undone")
+    profiling: bpy.props.BoolProperty(
+        name = "Profiling",
+        default = False,
+        description = "Time tool stages, show them in viewport and export to file when tool finishes")
+    profiling_file: bpy.props.StringProperty(
+        name = "Timings File",
+        default = "",
+        subtype = 'FILE_PATH',
+        description = "JSON file for exported timings, temporary directory if empty")
+    disk_cache: bpy.props.BoolProperty(
+        name = "Disk Cache",
+        default = False,
+        description = "Keep built path graphs in files, so large meshes open fast next time")
+    disk_cache_dir: bpy.props.StringProperty(
+        name = "Cache Directory",
+        default = "",
+        subtype = 'DIR_PATH',
+        description = "Directory of graph files, \"path_tool_cache\" next to .blend file if empty")
+    disk_cache_size: bpy.props.IntProperty(
+        name = "Cache Size",
+        default = 2048,
+        min = 1, max = 1000000,
+        description = "Maximum size of graph files in megabytes, least recently used are removed")
+    segment_workers: bpy.props.IntProperty(
+        name = "Search Processes",
+        default = 1,
+        min = 0, max = 256,
+        description = "Processes used to rebuild whole path on large meshes, 0 - number of CPUs, 1 - no extra processes")
+
+    key_confirm: key_property("confirm")
+    key_cancel: key_property("cancel")
+    key_add: key_property("add")
+    key_remove: key_property("remove")
+    key_menu: key_property("menu")
+    key_reverse: key_property("reverse")
+    key_fill_gap: key_property("fill_gap")
+    key_undo: key_property("undo")
+    key_redo: key_property("redo")
 
     def draw(self, context):
         layout = self.layout
@@ -79,6 +154,37 @@ class PathToolPreferences(bpy.types.AddonPreferences):
         col.prop(self, "vertex_size")
         col.prop(self, "edge_width")
 
+        col = layout.column(align = True)
+        col.prop(self, "path_search")
+        col.prop(self, "face_connectivity")
+        col.prop(self, "segment_cache_size")
+        col.prop(self, "undo_steps")
+        col.prop(self, "segment_workers")
+
+        col = layout.column(align = True)
+        col.prop(self, "profiling")
+        sub = col.column()
+        sub.active = self.profiling
+        sub.prop(self, "profiling_file")
+
+        col = layout.column(align = True)
+        col.prop(self, "disk_cache")
+        sub = col.column()
+        sub.active = self.disk_cache
+        sub.prop(self, "disk_cache_dir")
+        sub.prop(self, "disk_cache_size")
+
+        col = layout.column(align = True)
+        col.label(text = "Keys:")
+        for action, handler, default, hint in KEY_BINDINGS:
+            row = col.row()
+            try:
+                parse_keys(getattr(self, "key_" + action))
+            except ValueError:
+                # Default keys are used instead
+                row.alert = True
+            row.prop(self, "key_" + action)
+
 def register_keymap():
     wm = bpy.context.window_manager
     kc = wm.keyconfigs.user
@@ -115,13 +221,18 @@ def unregister_keymap():
 
 def register():
     bpy.utils.register_class(PathToolPreferences)
+    addon = bpy.context.preferences.addons.get(__name__)
+    load_event_map(addon.preferences if addon else None)
     bpy.utils.register_class(VIEW3D_OT_select_path)
     register_keymap()
     add_icon()
+    bpy.app.handlers.load_pre.append(clear_caches)
     bpy.utils.register_tool(PathSelectionTool, after = {"builtin.select_lasso"}, separator = False, group = False)
 
 def unregister():
     bpy.utils.unregister_tool(PathSelectionTool)
+    bpy.app.handlers.load_pre.remove(clear_caches)
+    clear_caches()
     bpy.utils.unregister_class(VIEW3D_OT_select_path)
     bpy.utils.unregister_class(PathToolPreferences)
     unregister_keymap()
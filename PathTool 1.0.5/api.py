@@ -0,0 +1,164 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+"""
+Path computation without the modal operator, usable in ``blender --background``.
+
+    from PathTool import api
+    paths = api.mark_paths(obj.data, [[0, 12, 40], [7, 99]], mode = "edges", mark_seam = "Mark")
+
+Control indices are vertex indices for "edges" mode and face indices for "faces" mode.
+Face paths use the same dual graph as the tool, connectivity "EDGE" or "VERTEX".
+Graphs are shared with the tool through graph_cache, and optionally stored in DiskGraphCache.
+"""
+
+import bmesh
+import bpy
+
+from array import array
+from collections import namedtuple
+
+from .apply_utils import apply_path
+from .draw_utils import MeshBuffers
+from .dual_graph import build_face_graph
+from .graph import (IndexPath, build_graph, find_segment, graph_cache)
+
+# segments - index arrays of path beetween every two control points
+# fill_gap_path - index array of path beetween last and first control points
+# indices - all path element indices without doubles, as applied by the tool
+Path = namedtuple("Path", ("segments", "fill_gap_path", "indices"))
+
+def compute_path(graph, controls, fill_gap = False, method = "AUTO"):
+    """Path through given control indices on graph, same as constructed by Path Tool"""
+    for ii in controls:
+        if not graph.same_island(controls[0], ii):
+            raise ValueError("Control points %d and %d are on different parts of mesh" % (controls[0], ii))
+
+    segments = []
+    for p1, p2 in zip(controls, controls[1:]):
+        if p1 == p2:
+            segments.append(array('i'))
+        else:
+            segments.append(find_segment(graph, p1, p2, method))
+
+    fill_gap_path = array('i')
+    if fill_gap and len(controls) > 2 and controls[0] != controls[-1]:
+        fill_gap_path = find_segment(graph, controls[0], controls[-1], method)
+
+    indices = IndexPath(graph.num_elements)
+    for fill in segments:
+        indices.extend(fill)
+    indices.extend(fill_gap_path)
+    if graph.mode == "faces":
+        indices.extend(controls)
+
+    return Path(segments, fill_gap_path, indices)
+
+def mesh_graph(mesh, bm, mode = "edges", connectivity = "EDGE", disk_cache = None, buffers = None):
+    """
+    Search graph of mesh, same as built by the tool. Mesh arrays must match bmesh.
+    Graph is reused from graph_cache, then from disk cache if given, while mesh fingerprint is the same
+    """
+    if buffers is None:
+        buffers = MeshBuffers(mesh)
+    digest = buffers.fingerprint()
+    kind = mode
+    if mode == "faces":
+        kind = "faces_" + connectivity.lower()
+    key = (mesh.as_pointer(), kind)
+    graph = graph_cache.get(key, digest)
+    if graph is not None:
+        return graph
+
+    disk_key = "%s_%s" % (kind, digest)
+    if disk_cache is not None:
+        graph = disk_cache.get(disk_key)
+    if graph is None:
+        if mode == "faces":
+            graph = build_face_graph(mesh, buffers.hide[2], connectivity)
+        else:
+            graph = build_graph(bm)
+        if disk_cache is not None:
+            disk_cache.put(disk_key, graph)
+    graph_cache.put(key, digest, graph)
+    return graph
+
+def sync_edit_mesh(mesh):
+    """Write edit mesh to mesh arrays, face graph and fingerprint are read from them"""
+    for obj in bpy.data.objects:
+        if obj.data == mesh and obj.mode == 'EDIT':
+            obj.update_from_editmode()
+            return
+
+def compute_paths(bm, chains, mode = "edges", fill_gap = False, method = "AUTO",
+                  connectivity = "EDGE", mesh = None, disk_cache = None):
+    """
+    Paths for every chain of control indices, graph is built once for all chains.
+    Graph is taken from caches when mesh with arrays matching bmesh is given.
+    Bmesh alone has no cache key, its graph is always built, for faces from temporary mesh copy
+    """
+    if mesh is not None:
+        graph = mesh_graph(mesh, bm, mode, connectivity, disk_cache)
+    elif mode == "faces":
+        temp = bpy.data.meshes.new("PathTool")
+        try:
+            bm.to_mesh(temp)
+            graph = build_face_graph(temp, None, connectivity)
+        finally:
+            bpy.data.meshes.remove(temp)
+    else:
+        graph = build_graph(bm)
+    return [compute_path(graph, controls, fill_gap, method) for controls in chains]
+
+def mark_paths(data, chains, mode = "edges", fill_gap = False, method = "AUTO",
+               mark_select = "None", mark_seam = "None", mark_sharp = "None", connectivity = "EDGE",
+               disk_cache = None):
+    """
+    Compute paths for chains of control indices on mesh or bmesh and apply
+    select ("Extend", "Subtract", "Invert"), seam and sharp ("Mark", "Clear", "Toogle") actions.
+    Return's list of computed paths
+    """
+    if isinstance(data, bmesh.types.BMesh):
+        bm = data
+        mesh = None
+    elif data.is_editmode:
+        bm = bmesh.from_edit_mesh(data)
+        mesh = data
+        sync_edit_mesh(mesh)
+    else:
+        bm = bmesh.new()
+        bm.from_mesh(data)
+        mesh = data
+
+    paths = compute_paths(bm, chains, mode, fill_gap, method, connectivity, mesh, disk_cache)
+    for path in paths:
+        apply_path(bm, mode, path.indices, mark_select, mark_seam, mark_sharp)
+
+    if mesh is not None:
+        if mesh.is_editmode:
+            bm.select_flush_mode()
+            bmesh.update_edit_mesh(mesh, False, False)
+        else:
+            bm.select_flush_mode()
+            bm.to_mesh(mesh)
+            bm.free()
+            mesh.update()
+
+    return paths
@@ -0,0 +1,86 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+import numpy as np
+
+from .graph import IndexPath
+
+def mask_operation(state, action):
+    """New state of path elements for given action, state is boolean array"""
+    if action in ("Extend", "Mark"):
+        return np.ones_like(state)
+    elif action in ("Subtract", "Clear"):
+        return np.zeros_like(state)
+    elif action in ("Invert", "Toogle"):
+        return ~state
+    return state
+
+def apply_flag(elements, attr, action, invert = False):
+    """
+    Apply action to boolean attribute of elements, only changed elements are written.
+    With invert, action is applied to negated attribute (sharp is not smooth)
+    """
+    if action == "None" or not elements:
+        return
+    state = np.fromiter((getattr(elem, attr) for elem in elements), dtype = bool, count = len(elements))
+    if invert:
+        state = ~state
+    new_state = mask_operation(state, action)
+    changed = np.flatnonzero(new_state != state)
+    if invert:
+        new_state = ~new_state
+    for ii in changed.tolist():
+        setattr(elements[ii], attr, bool(new_state[ii]))
+
+def apply_select(elements, action):
+    """Apply select action to elements, only changed elements are written"""
+    if action == "None" or not elements:
+        return
+    state = np.fromiter((elem.select for elem in elements), dtype = bool, count = len(elements))
+    new_state = mask_operation(state, action)
+    for ii in np.flatnonzero(new_state != state).tolist():
+        elements[ii].select_set(bool(new_state[ii]))
+
+def path_edges(bm, mesh_elements, path_indices):
+    """Edges of path, for face path - unique edges of path faces"""
+    if mesh_elements == "edges":
+        edges = bm.edges
+        return [edges[ii] for ii in path_indices]
+    elif mesh_elements == "faces":
+        faces = bm.faces
+        edge_path = IndexPath(len(bm.edges))
+        for ii in path_indices:
+            edge_path.extend(edge.index for edge in faces[ii].edges)
+        edges = bm.edges
+        return [edges[ii] for ii in edge_path]
+
+def apply_path(bm, mesh_elements, path_indices, mark_select, mark_seam, mark_sharp):
+    """Apply select, seam and sharp actions to path elements by given indices"""
+    for seq in (bm.verts, bm.edges, bm.faces):
+        seq.ensure_lookup_table()
+
+    elems = getattr(bm, mesh_elements)
+    path = [elems[ii] for ii in path_indices]
+    apply_select(path, mark_select)
+
+    if mark_seam != "None" or mark_sharp != "None":
+        edges = path_edges(bm, mesh_elements, path_indices)
+        apply_flag(edges, "seam", mark_seam)
+        apply_flag(edges, "smooth", mark_sharp, invert = True)
@@ -0,0 +1,246 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+"""
+Apply Path Tool paths to many .blend files with a pool of background Blender processes.
+
+    python batch.py manifest.json --blender /path/to/blender --jobs 8 --report report.json
+
+Manifest is JSON list of jobs (or {"jobs": [...]}):
+    {"file": "a.blend", "object": "Body", "paths": [[0, 12, 40], [7, 99]],
+     "mode": "edges", "fill_gap": false, "mark_select": "None", "mark_seam": "Mark", "mark_sharp": "None"}
+or CSV with header "file,object,controls[,mode,fill_gap,method,connectivity,mark_select,mark_seam,mark_sharp]",
+one path per row, controls separated by spaces.
+
+Files are processed by one Blender process each, in parallel.
+Same script runs inside Blender as worker, called with "-- --worker".
+"""
+
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+JOB_DEFAULTS = {
+    "mode": "edges",
+    "fill_gap": False,
+    "method": "AUTO",
+    "connectivity": "EDGE",
+    "mark_select": "None",
+    "mark_seam": "Mark",
+    "mark_sharp": "None",
+}
+
+DISK_CACHE_BYTES = 2048 * 1024 * 1024
+
+def read_manifest(filepath):
+    """Return's list of jobs, one job per file object and options"""
+    if os.path.splitext(filepath)[1].lower() == ".csv":
+        return read_csv_manifest(filepath)
+    with open(filepath) as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data["jobs"]
+    base = os.path.dirname(os.path.abspath(filepath))
+    jobs = []
+    for item in data:
+        job = dict(JOB_DEFAULTS)
+        job.update(item)
+        job["file"] = os.path.join(base, job["file"])
+        jobs.append(job)
+    return jobs
+
+def read_csv_manifest(filepath):
+    base = os.path.dirname(os.path.abspath(filepath))
+    jobs = dict()
+    with open(filepath, newline = "") as f:
+        for row in csv.DictReader(f):
+            job = dict(JOB_DEFAULTS)
+            for key, value in row.items():
+                if key in JOB_DEFAULTS and value not in (None, ""):
+                    job[key] = value
+            job["fill_gap"] = str(job["fill_gap"]).lower() in ("1", "true", "yes")
+            job["file"] = os.path.join(base, row["file"])
+            job["object"] = row["object"]
+            key = tuple(job[k] for k in sorted(job))
+            job = jobs.setdefault(key, dict(job, paths = []))
+            job["paths"].append([int(ii) for ii in row["controls"].split()])
+    return list(jobs.values())
+
+def group_by_file(jobs):
+    files = dict()
+    for job in jobs:
+        files.setdefault(job["file"], []).append(job)
+    return files
+
+def run_file(blender, filepath, jobs, output_dir, timeout, disk_cache = None):
+    """Run Blender worker for all jobs of one file, return's report of file"""
+    with tempfile.TemporaryDirectory() as tmp:
+        task_path = os.path.join(tmp, "task.json")
+        result_path = os.path.join(tmp, "result.json")
+        output = None
+        if output_dir:
+            output = os.path.join(output_dir, os.path.basename(filepath))
+        with open(task_path, "w") as f:
+            json.dump({"jobs": jobs, "output": output, "disk_cache": disk_cache}, f)
+
+        cmd = [blender, "--background", "--factory-startup", filepath, "--python-exit-code", "1",
+               "--python", os.path.abspath(__file__), "--",
+               "--worker", task_path, "--result", result_path]
+        start = time.perf_counter()
+        try:
+            proc = subprocess.run(cmd, stdout = subprocess.PIPE, stderr = subprocess.STDOUT,
+                                  universal_newlines = True, timeout = timeout)
+            returncode, log = proc.returncode, proc.stdout
+        except subprocess.TimeoutExpired as ex:
+            returncode, log = None, "Timeout after %s seconds\n%s" % (timeout, ex.stdout or "")
+        seconds = time.perf_counter() - start
+
+        report = {"file": filepath, "returncode": returncode, "seconds": seconds, "jobs": []}
+        if os.path.isfile(result_path):
+            with open(result_path) as f:
+                report.update(json.load(f))
+        if returncode != 0 or not report["jobs"]:
+            report["error"] = log[-4000:]
+        return report
+
+def run_manifest(manifest, blender, processes = None, output_dir = None, timeout = None, disk_cache = None):
+    """Process all jobs of manifest, return's report"""
+    files = group_by_file(read_manifest(manifest))
+    processes = processes or os.cpu_count() or 1
+    if output_dir:
+        os.makedirs(output_dir, exist_ok = True)
+
+    start = time.perf_counter()
+    # Threads only wait for Blender processes
+    with ThreadPoolExecutor(max_workers = processes) as pool:
+        futures = [pool.submit(run_file, blender, filepath, jobs, output_dir, timeout, disk_cache)
+                   for filepath, jobs in files.items()]
+        reports = [future.result() for future in futures]
+
+    failed = [r for r in reports if "error" in r or any("error" in job for job in r["jobs"])]
+    return {
+        "processes": processes,
+        "files": len(reports),
+        "failed_files": len(failed),
+        "seconds": time.perf_counter() - start,
+        "reports": reports,
+    }
+
+def run_worker(task_path, result_path):
+    """Called inside Blender: apply jobs to loaded file and save it"""
+    import bpy
+    api = load_module("api")
+
+    with open(task_path) as f:
+        task = json.load(f)
+    disk_cache = None
+    if task.get("disk_cache"):
+        disk_cache = load_module("disk_cache").DiskGraphCache(task["disk_cache"], DISK_CACHE_BYTES)
+
+    results = []
+    for job in task["jobs"]:
+        result = {"object": job["object"], "paths": len(job["paths"])}
+        start = time.perf_counter()
+        try:
+            obj = bpy.data.objects.get(job["object"])
+            if obj is None or obj.type != 'MESH':
+                raise ValueError("Mesh object %r not found" % job["object"])
+            paths = api.mark_paths(obj.data, job["paths"], mode = job["mode"],
+                                   fill_gap = job["fill_gap"], method = job["method"],
+                                   connectivity = job["connectivity"],
+                                   mark_select = job["mark_select"], mark_seam = job["mark_seam"],
+                                   mark_sharp = job["mark_sharp"], disk_cache = disk_cache)
+            result["elements"] = sum(len(path.indices) for path in paths)
+        except Exception as ex:
+            result["error"] = "%s: %s" % (type(ex).__name__, ex)
+        result["seconds"] = time.perf_counter() - start
+        results.append(result)
+
+    start = time.perf_counter()
+    if any("error" not in result for result in results):
+        if task["output"]:
+            bpy.ops.wm.save_as_mainfile(filepath = task["output"], copy = True)
+        else:
+            bpy.ops.wm.save_mainfile()
+    save_seconds = time.perf_counter() - start
+
+    with open(result_path, "w") as f:
+        json.dump({"jobs": results, "save_seconds": save_seconds}, f)
+
+def load_module(name):
+    """Import add-on module by name from enabled add-on or from this directory"""
+    import importlib
+    import importlib.util
+    if "PathTool" not in sys.modules:
+        package_dir = os.path.dirname(os.path.abspath(__file__))
+        spec = importlib.util.spec_from_file_location("PathTool", os.path.join(package_dir, "__init__.py"),
+                                                      submodule_search_locations = [package_dir])
+        module = importlib.util.module_from_spec(spec)
+        sys.modules["PathTool"] = module
+        spec.loader.exec_module(module)
+    return importlib.import_module("PathTool." + name)
+
+def main(argv):
+    parser = argparse.ArgumentParser(description = "Apply Path Tool paths to many .blend files")
+    parser.add_argument("manifest", nargs = "?", help = "JSON or CSV job manifest")
+    parser.add_argument("--blender", default = "blender", help = "Blender executable")
+    parser.add_argument("--jobs", type = int, default = None, help = "Number of Blender processes, default - CPU count")
+    parser.add_argument("--output-dir", default = None, help = "Save results here instead of overwriting files")
+    parser.add_argument("--timeout", type = float, default = None, help = "Seconds per file")
+    parser.add_argument("--report", default = None, help = "Write JSON report to file")
+    parser.add_argument("--disk-cache", default = None,
+                        help = "Directory of graph cache shared by processes and runs")
+    parser.add_argument("--worker", default = None, help = argparse.SUPPRESS)
+    parser.add_argument("--result", default = None, help = argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        run_worker(args.worker, args.result)
+        return 0
+
+    if not args.manifest:
+        parser.error("manifest is required")
+    disk_cache = os.path.abspath(args.disk_cache) if args.disk_cache else None
+    report = run_manifest(args.manifest, args.blender, args.jobs, args.output_dir, args.timeout, disk_cache)
+    text = json.dumps(report, indent = 2)
+    if args.report:
+        with open(args.report, "w") as f:
+            f.write(text)
+
+    for file_report in report["reports"]:
+        status = "FAILED" if ("error" in file_report or
+                              any("error" in job for job in file_report["jobs"])) else "ok"
+        print("%-6s %8.2fs  %s" % (status, file_report["seconds"], file_report["file"]))
+    print("%d files, %d failed, %.2fs with %d processes" % (report["files"], report["failed_files"],
+                                                         report["seconds"], report["processes"]))
+    return 1 if report["failed_files"] else 0
+
+if __name__ == "__main__":
+    argv = sys.argv[1:]
+    if "--" in argv:
+        argv = argv[argv.index("--") + 1:]
+    sys.exit(main(argv))
@@ -0,0 +1,288 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+"""
+Path Tool benchmark on generated meshes.
+
+    blender --background --factory-startup --python benchmark.py -- --sizes 10000 1000000 --output bench.json
+
+Meshes: grid, uvsphere, cube (subdivided), islands (16 separate grids), size is approximate face count.
+Stages are timed on operator code the same way they run in the tool: first click setup,
+segment search, full path update, overlay vertex arrays, overlay batches and execute.
+Vertex arrays are built on CPU and timed in every mode. Their upload to GPU batches
+needs a GPU context, so in background mode create_batches is reported as null.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+
+import bmesh
+import bpy
+import gpu
+
+from mathutils import Matrix
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from batch import load_module
+
+utils = load_module("utils")
+apply_utils = load_module("apply_utils")
+draw_utils = load_module("draw_utils")
+graph_module = load_module("graph")
+
+ISLANDS = 16
+
+def make_grid(bm, size):
+    n = max(1, round(math.sqrt(size)))
+    bmesh.ops.create_grid(bm, x_segments = n, y_segments = n, size = 1.0)
+
+def make_uvsphere(bm, size):
+    n = max(3, round(math.sqrt(size / 2)))
+    try:
+        bmesh.ops.create_uvsphere(bm, u_segments = 2 * n, v_segments = n, radius = 1.0)
+    except TypeError:
+        bmesh.ops.create_uvsphere(bm, u_segments = 2 * n, v_segments = n, diameter = 1.0)
+
+def make_cube(bm, size):
+    cuts = max(0, round(math.sqrt(size / 6)) - 1)
+    bmesh.ops.create_cube(bm, size = 2.0)
+    if cuts:
+        bmesh.ops.subdivide_edges(bm, edges = bm.edges[:], cuts = cuts, use_grid_fill = True)
+
+def make_islands(bm, size):
+    n = max(1, round(math.sqrt(size / ISLANDS)))
+    side = round(math.sqrt(ISLANDS))
+    for ii in range(ISLANDS):
+        matrix = Matrix.Translation(((ii % side) * 3.0, (ii // side) * 3.0, 0.0))
+        bmesh.ops.create_grid(bm, x_segments = n, y_segments = n, size = 1.0, matrix = matrix)
+
+MESHES = {
+    "grid": make_grid,
+    "uvsphere": make_uvsphere,
+    "cube": make_cube,
+    "islands": make_islands,
+}
+
+class BenchmarkTool(utils.PathUtils, utils.PathUndo):
+    """Path Tool operator state without window, handlers and tool properties"""
+
+    def report(self, type, message):
+        pass
+
+def timed(func, *args):
+    """Return's result of function and seconds it took"""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def create_object(context, name, generator, size):
+    """Generate mesh object, make it active and enter edit mode"""
+    bm = bmesh.new()
+    generator(bm, size)
+    mesh = bpy.data.meshes.new(name)
+    bm.to_mesh(mesh)
+    bm.free()
+
+    obj = bpy.data.objects.new(name, mesh)
+    context.scene.collection.objects.link(obj)
+    for other in context.view_layer.objects:
+        other.select_set(False)
+    obj.select_set(True)
+    context.view_layer.objects.active = obj
+    bpy.ops.object.mode_set(mode = 'EDIT')
+    return obj
+
+def remove_object(obj):
+    bpy.ops.object.mode_set(mode = 'OBJECT')
+    mesh = obj.data
+    bpy.data.objects.remove(obj)
+    bpy.data.meshes.remove(mesh)
+
+def random_controls(graph, rng, count, island = None):
+    """Random distinct nodes on one island"""
+    islands = graph.islands
+    if island is None:
+        island = islands[rng.randrange(graph.num_nodes)]
+    size = sum(1 for label in islands if label == island)
+    controls = []
+    while len(controls) < min(count, size):
+        ii = rng.randrange(graph.num_nodes)
+        if islands[ii] == island and ii not in controls:
+            controls.append(ii)
+    return controls
+
+def execute_path(tool, context):
+    """Same work as operator execute"""
+    tool.create_bmesh(context)
+    apply_utils.apply_path(tool.bm, tool.mesh_elements, tool.path_indices,
+                           tool.mark_select, tool.mark_seam, tool.mark_sharp)
+    tool.update_mesh(context)
+
+def overlay_vertices(tool):
+    """CPU part of create_batches: vertex arrays of path segments and control points"""
+    return draw_utils.overlay_vertices(tool, tool.path_vertex_arrays())
+
+def run_case(context, mesh_name, size, mode, args):
+    rng = random.Random(args.seed)
+    obj = create_object(context, "bench_%s_%d" % (mesh_name, size), MESHES[mesh_name], size)
+    if mode == "edges":
+        mesh_mode = (False, True, False)
+    else:
+        mesh_mode = (False, False, True)
+    context.scene.tool_settings.mesh_select_mode = mesh_mode
+
+    tool = BenchmarkTool()
+    tool.mesh_elements = mode
+    tool.select_mode = tool.mesh_mode = mesh_mode
+    tool.mark_select, tool.mark_seam, tool.mark_sharp = "Extend", "Mark", "None"
+    cache = graph_module.segment_cache
+
+    tool.load_preferences()
+    tool.disk_cache = False
+    graph_module.graph_cache.clear()
+    stages = dict()
+    _, stages["create_bmesh"] = timed(tool.create_bmesh, context)
+    _, stages["create_buffers"] = timed(tool.create_buffers, context)
+    _, stages["create_graph"] = timed(tool.create_graph)
+    _, stages["islands"] = timed(lambda: tool.graph.islands)
+    _, stages["create_bvh"] = timed(tool.create_bvh)
+    stages["first_click"] = sum(stages.values())
+
+    # Next invoke on unchanged mesh
+    start = time.perf_counter()
+    tool.create_bmesh(context)
+    tool.create_buffers(context)
+    tool.create_graph()
+    tool.graph.islands
+    tool.create_bvh()
+    stages["first_click_cached"] = time.perf_counter() - start
+
+    tool.reset_path_state()
+    cache.resize(tool.segment_cache_size)
+    elements = getattr(tool.bm, mode)
+
+    segment_times = []
+    segment_lengths = []
+    for _ in range(args.segments):
+        p1, p2 = random_controls(tool.graph, rng, 2)
+        cache.clear()
+        fill, seconds = timed(tool.update_path_beetween_two, elements[p1], elements[p2])
+        segment_times.append(seconds)
+        segment_lengths.append(len(fill))
+
+    controls = random_controls(tool.graph, rng, args.controls)
+    tool.control_elements = [elements[ii] for ii in controls]
+    cache.clear()
+    _, stages["full_path_update"] = timed(tool.full_path_update)
+    _, stages["full_path_update_cached"] = timed(tool.full_path_update)
+
+    # Overlay vertex arrays of all segments, then again with unchanged segments reused
+    tool.segment_vertices = dict()
+    _, stages["overlay_vertices"] = timed(overlay_vertices, tool)
+    _, stages["overlay_vertices_cached"] = timed(overlay_vertices, tool)
+
+    stages["create_batches"] = None
+    if not bpy.app.background:
+        tool.shader = gpu.shader.from_builtin('3D_SMOOTH_COLOR')
+        _, stages["create_batches"] = timed(tool.create_batches)
+
+    tool.path_indices = tool.get_path()
+    _, stages["execute"] = timed(execute_path, tool, context)
+
+    result = {
+        "mesh": mesh_name,
+        "size": size,
+        "mode": mode,
+        "verts": len(tool.bm.verts),
+        "edges": len(tool.bm.edges),
+        "faces": len(tool.bm.faces),
+        "controls": len(controls),
+        "path_elements": len(tool.path_indices),
+        "stages": stages,
+        "segment": {
+            "count": len(segment_times),
+            "mean": sum(segment_times) / len(segment_times),
+            "p50": percentile(segment_times, 0.5),
+            "p95": percentile(segment_times, 0.95),
+            "max": max(segment_times),
+            "mean_elements": sum(segment_lengths) / len(segment_lengths),
+        },
+    }
+    remove_object(obj)
+    return result
+
+def main(argv):
+    parser = argparse.ArgumentParser(description = "Path Tool benchmark")
+    parser.add_argument("--meshes", nargs = "+", choices = sorted(MESHES), default = list(MESHES))
+    parser.add_argument("--sizes", nargs = "+", type = int, default = [10000, 100000, 1000000, 5000000],
+                        help = "Approximate face counts")
+    parser.add_argument("--modes", nargs = "+", choices = ("edges", "faces"), default = ["edges", "faces"])
+    parser.add_argument("--segments", type = int, default = 20, help = "Number of timed segment searches")
+    parser.add_argument("--controls", type = int, default = 20, help = "Control points for full path update")
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--output", default = None, help = "Write JSON results to file")
+    args = parser.parse_args(argv)
+
+    context = bpy.context
+    if context.object and context.object.mode != 'OBJECT':
+        bpy.ops.object.mode_set(mode = 'OBJECT')
+
+    results = []
+    for mesh_name in args.meshes:
+        for size in args.sizes:
+            for mode in args.modes:
+                result = run_case(context, mesh_name, size, mode, args)
+                results.append(result)
+                print("%-9s %8d %-5s setup %7.3fs  segment %7.4fs  full %7.3fs  "
+                      "overlay %7.3fs  execute %7.3fs" % (
+                    mesh_name, size, mode, result["stages"]["first_click"], result["segment"]["mean"],
+                    result["stages"]["full_path_update"], result["stages"]["overlay_vertices"],
+                    result["stages"]["execute"]))
+
+    report = {
+        "version": ".".join(map(str, sys.modules["PathTool"].bl_info["version"])),
+        "blender": bpy.app.version_string,
+        "platform": platform.platform(),
+        "background": bpy.app.background,
+        "seed": args.seed,
+        "results": results,
+    }
+    text = json.dumps(report, indent = 2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    argv = sys.argv[1:]
+    if "--" in argv:
+        argv = argv[argv.index("--") + 1:]
+    main(argv)
@@ -0,0 +1,170 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+import json
+import mmap
+import os
+import struct
+import sys
+
+from .graph import MeshGraph
+
+MAGIC = b"PTGRAPH1"
+SUFFIX = ".ptgraph"
+ALIGN = 8
+
+# Graph arrays stored in file, name and typecode
+SECTIONS = (("offsets", 'i'), ("neighbors", 'i'), ("links", 'i'),
+            ("weights", 'd'), ("coords", 'd'), ("islands", 'i'))
+
+def save_graph(graph, filepath):
+    """
+    Write graph arrays to file: magic, header size, json header, aligned raw arrays.
+    File is written under temporary name and renamed, so readers never see partial file
+    """
+    arrays = [(name, typecode, getattr(graph, name)) for name, typecode in SECTIONS]
+    sections = []
+    offset = 0
+    for name, typecode, arr in arrays:
+        size = len(arr) * arr.itemsize
+        sections.append((name, typecode, offset, len(arr)))
+        offset += size + (-size) % ALIGN
+    header = json.dumps({
+        "mode": graph.mode,
+        "num_elements": graph.num_elements,
+        "fingerprint": graph.fingerprint,
+        "byteorder": sys.byteorder,
+        "sections": sections,
+    }).encode()
+    header += b" " * ((-len(header) - len(MAGIC) - 4) % ALIGN)
+
+    tmp_path = "%s.%d.tmp" % (filepath, os.getpid())
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        for name, typecode, arr in arrays:
+            data = memoryview(arr).cast('B')
+            f.write(data)
+            f.write(bytes((-len(data)) % ALIGN))
+    os.replace(tmp_path, filepath)
+
+def load_graph(filepath):
+    """Map graph file to memory, arrays of graph are views of mapped file without copy"""
+    with open(filepath, "rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not a path graph file: %s" % filepath)
+    start = len(MAGIC) + 4
+    header_size, = struct.unpack("<I", data[len(MAGIC):start])
+    header = json.loads(data[start:start + header_size].decode())
+    if header["byteorder"] != sys.byteorder:
+        raise ValueError("Path graph file has other byte order: %s" % filepath)
+
+    view = memoryview(data)
+    start += header_size
+    arrays = dict()
+    for name, typecode, offset, count in header["sections"]:
+        begin = start + offset
+        end = begin + count * struct.calcsize(typecode)
+        if end > len(data):
+            raise ValueError("Path graph file is truncated: %s" % filepath)
+        arrays[name] = view[begin:end].cast(typecode)
+
+    graph = MeshGraph(header["mode"], arrays["offsets"], arrays["neighbors"], arrays["links"],
+                      arrays["weights"], arrays["coords"], header["num_elements"],
+                      islands = arrays["islands"], digest = header["fingerprint"])
+    # Mapping must live as long as graph arrays
+    graph.mapping = data
+    graph.filepath = filepath
+    return graph
+
+class DiskGraphCache:
+    """
+    Directory of memory mapped graph files keyed by mesh fingerprint and mode.
+    Total size is limited, least recently used files are removed first
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def filepath(self, key):
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def get(self, key):
+        """Return's mapped graph or None, broken files are removed"""
+        filepath = self.filepath(key)
+        if not os.path.isfile(filepath):
+            return None
+        try:
+            graph = load_graph(filepath)
+            os.utime(filepath)
+        except (OSError, ValueError, KeyError):
+            self.remove(filepath)
+            return None
+        return graph
+
+    def put(self, key, graph):
+        graph.islands
+        try:
+            os.makedirs(self.directory, exist_ok = True)
+            save_graph(graph, self.filepath(key))
+        except OSError:
+            return False
+        graph.filepath = self.filepath(key)
+        self.evict()
+        return True
+
+    def entries(self):
+        """Cache files as (last use time, size, path), oldest first"""
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return entries
+        for name in names:
+            if name.endswith(SUFFIX):
+                filepath = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(filepath)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, filepath))
+        entries.sort()
+        return entries
+
+    def evict(self):
+        """Remove least recently used files until cache fits size limit"""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, filepath in entries:
+            if total <= self.max_bytes:
+                break
+            if self.remove(filepath):
+                total -= size
+
+    def remove(self, filepath):
+        try:
+            os.remove(filepath)
+        except OSError:
+            # Mapped files can't be removed on Windows
+            return False
+        return True
@@ -20,106 +20,221 @@
 
 import bpy
 import bmesh
-import bgl
+import blf
+try:
+    import bgl
+except ImportError:
+    # Removed in newer Blender, gpu.state is used there
+    bgl = None
+import gpu
+import numpy as np
+from time import perf_counter
 from gpu_extras.batch import batch_for_shader
 
-def create_batch_control_points(self):
-    matrix_world = bpy.context.active_object.matrix_world
+from .graph import fingerprint
+from .profiling import (profiled, profiler)
+
+class MeshBuffers:
+    """Contiguous arrays of edit mesh vertices, edges and loop triangles"""
+
+    def __init__(self, mesh):
+        mesh.calc_loop_triangles()
+        self.digest = None
+
+        self.co = np.empty(len(mesh.vertices) * 3, dtype = np.float32)
+        mesh.vertices.foreach_get("co", self.co)
+        self.co.shape = (-1, 3)
+
+        self.edge_verts = np.empty(len(mesh.edges) * 2, dtype = np.int32)
+        mesh.edges.foreach_get("vertices", self.edge_verts)
+        self.edge_verts.shape = (-1, 2)
+
+        self.tri_verts = np.empty(len(mesh.loop_triangles) * 3, dtype = np.int32)
+        mesh.loop_triangles.foreach_get("vertices", self.tri_verts)
+        self.tri_verts.shape = (-1, 3)
+
+        # Loop triangles are ordered by polygon
+        tri_faces = np.empty(len(mesh.loop_triangles), dtype = np.int32)
+        mesh.loop_triangles.foreach_get("polygon_index", tri_faces)
+        self.tri_counts = np.bincount(tri_faces, minlength = len(mesh.polygons)).astype(np.int32)
+        self.tri_starts = np.zeros(len(mesh.polygons), dtype = np.int32)
+        np.cumsum(self.tri_counts[:-1], dtype = np.int32, out = self.tri_starts[1:])
+
+        self.hide = []
+        for seq in (mesh.vertices, mesh.edges, mesh.polygons):
+            hide = np.empty(len(seq), dtype = bool)
+            seq.foreach_get("hide", hide)
+            self.hide.append(hide)
+
+    def fingerprint(self):
+        """Hash of mesh topology, coordinates and hidden state"""
+        if self.digest is None:
+            self.digest = fingerprint("mesh", self.co, self.edge_verts, self.tri_verts, self.tri_counts,
+                                      *self.hide)
+        return self.digest
+
+    def visible_triangles(self):
+        """Vertex indices of loop triangles of visible faces, 3 per triangle, and face of every triangle"""
+        tri_faces = np.repeat(np.arange(len(self.tri_counts), dtype = np.int32), self.tri_counts)
+        visible = ~self.hide[2][tri_faces]
+        return self.tri_verts[visible], tri_faces[visible]
+
+    def face_triangles(self, faces):
+        """Vertex indices of loop triangles of given faces, 3 per triangle"""
+        counts = self.tri_counts[faces]
+        total = int(counts.sum())
+        firsts = np.cumsum(counts) - counts
+        tris = np.repeat(self.tri_starts[faces] - firsts, counts) + np.arange(total, dtype = np.int32)
+        return self.tri_verts[tris].ravel()
+
+    def edge_lines(self, edges):
+        """Vertex indices of given edges, 2 per edge"""
+        return self.edge_verts[edges].ravel()
+
+    def positions(self, verts):
+        """Object space positions of given vertex indices, world matrix is applied when drawn"""
+        return self.co[verts]
+
+def element_indices(elements):
+    return np.fromiter((elem.index for elem in elements), dtype = np.int32, count = len(elements))
+
+def color_array(color, count):
+    return np.tile(np.array(color, dtype = np.float32), (count, 1))
+
+def control_point_vertices(self):
+    """
+    Vertex arrays of control points: (positions, colors) of control face triangles
+    and (positions, colors) of control vertices or face centers
+    """
     control_vertices = [elem for elem in self.control_elements if type(elem) == bmesh.types.BMVert]
     control_faces = [elem for elem in self.control_elements if type(elem) == bmesh.types.BMFace]
+    active = (self.fill_gap == False or len(self.control_elements) <= 2)
+    faces = empty_vertices()
+    points = empty_vertices()
 
     if control_vertices:
-        vert_positions = [matrix_world @ v.co for v in control_vertices]
-        vert_colors = []
-        for vertex in control_vertices:
-            if self.fill_gap == False or len(self.control_elements) <= 2:
+        vert_positions = self.buffers.positions(element_indices(control_vertices))
+        vert_colors = color_array(self.color_control_point, len(control_vertices))
+        if active:
+            for ii, vertex in enumerate(control_vertices):
                 if vertex == self.control_elements[-1]:
-                    vert_colors.append(self.color_active)
-                else:
-                    vert_colors.append(self.color_control_point)
-            else:
-                vert_colors.append(self.color_control_point)
-
-        self.batch_cp_verts = batch_for_shader(self.shader, 'POINTS', {"pos": vert_positions, "color": vert_colors})
+                    vert_colors[ii] = self.color_active
+        points = (vert_positions, vert_colors)
 
     if control_faces:
-        temp_bmesh = bmesh.new()
-        for face in control_faces:
-            temp_bmesh.faces.new((temp_bmesh.verts.new(v.co, v) for v in face.verts), face)
-        temp_bmesh.verts.index_update()
-        temp_bmesh.faces.ensure_lookup_table()
-
-        vert_positions = [matrix_world @ v.co for v in temp_bmesh.verts]
-        face_indices = [(loop.vert.index for loop in looptris) for looptris
-                        in temp_bmesh.calc_loop_triangles()]
-
-        face_centers = [matrix_world @ f.calc_center_median() for f in temp_bmesh.faces]
-        face_center_colors = [self.color_face_center for f in temp_bmesh.faces]
-
-        vert_colors = []
-        for vertex in temp_bmesh.verts:
-            if self.fill_gap == False or len(self.control_elements) <= 2:
-                if vertex in temp_bmesh.faces[-1].verts:
-                    vert_colors.append(self.color_active)
-                else:
-                    vert_colors.append(self.color_control_point)
-            else:
-                vert_colors.append(self.color_control_point)
-
-        self.batch_cp_faces = batch_for_shader(self.shader, 'TRIS',
-                                               {"pos": vert_positions, "color": vert_colors}, indices = face_indices)
-
-        self.batch_cp_verts = batch_for_shader(self.shader, 'POINTS',
-                                               {"pos": face_centers, "color": face_center_colors})
-
-def create_batch_path(self, path):
-    matrix_world = bpy.context.active_object.matrix_world
-
-    if self.mesh_elements == "faces":
-        temp_bmesh = bmesh.new()
-        for face in path:
-            temp_bmesh.faces.new((temp_bmesh.verts.new(v.co, v) for v in face.verts), face)
-        temp_bmesh.verts.index_update()
-        temp_bmesh.faces.ensure_lookup_table()
-
-        vert_positions = [matrix_world @ v.co for v in temp_bmesh.verts]
-        face_indices = [(loop.vert.index for loop in looptris) for looptris in temp_bmesh.calc_loop_triangles()]
-        vert_colors = [self.color_fill for _ in range(len(temp_bmesh.verts))]
-
-        self.batch_path = batch_for_shader(self.shader, 'TRIS',
-                                           {"pos": vert_positions, "color": vert_colors}, indices = face_indices)
-
-    elif self.mesh_elements == "edges":
-        vert_positions = []
-        vert_colors = []
-        for edge in path:
-            for vert in edge.verts:
-                vert_positions.append(matrix_world @ vert.co)
-                vert_colors.append(self.color_fill)
-        self.batch_path = batch_for_shader(self.shader, 'LINES',
-                                           {"pos": vert_positions, "color": vert_colors})
-
-def draw_callback_3d(self, op, context):
-    bgl.glPointSize(self.vertex_size)
-    bgl.glLineWidth(self.edge_width)
+        verts = self.buffers.face_triangles(element_indices(control_faces))
+        vert_positions = self.buffers.positions(verts)
+        vert_colors = color_array(self.color_control_point, len(verts))
+        if active:
+            last = self.buffers.tri_counts[control_faces[-1].index] * 3
+            vert_colors[len(verts) - last:] = self.color_active
+        faces = (vert_positions, vert_colors)
 
-    bgl.glEnable(bgl.GL_MULTISAMPLE)
-    bgl.glEnable(bgl.GL_LINE_SMOOTH)
-    bgl.glHint(bgl.GL_LINE_SMOOTH_HINT, bgl.GL_NICEST)
+        face_centers = np.array([f.calc_center_median() for f in control_faces], dtype = np.float32)
+        points = (face_centers, color_array(self.color_face_center, len(control_faces)))
 
-    bgl.glBlendFunc(bgl.GL_SRC_ALPHA, bgl.GL_ONE_MINUS_SRC_ALPHA)
-    bgl.glEnable(bgl.GL_BLEND)
+    return faces, points
 
-    bgl.glEnable(bgl.GL_POLYGON_SMOOTH)
-    bgl.glHint(bgl.GL_POLYGON_SMOOTH_HINT, bgl.GL_NICEST)
-
-    bgl.glEnable(bgl.GL_DEPTH_TEST)
-    bgl.glDepthFunc(bgl.GL_ALWAYS)
-
-    self.shader.bind()
-    if self.batch_path:
-        self.batch_path.draw(self.shader)
-    if self.batch_cp_faces:
-        self.batch_cp_faces.draw(self.shader)
-    if self.batch_cp_verts:
-        self.batch_cp_verts.draw(self.shader)
+def path_vertices(self, path):
+    """Vertex arrays (positions, colors) of path elements by given indices, triangles or lines"""
+    if self.mesh_elements == "faces":
+        verts = self.buffers.face_triangles(np.asarray(path, dtype = np.int32))
+    else:
+        verts = self.buffers.edge_lines(np.asarray(path, dtype = np.int32))
+    return (self.buffers.positions(verts), color_array(self.color_fill, len(verts)))
+
+def empty_vertices():
+    return (np.empty((0, 3), dtype = np.float32), np.empty((0, 4), dtype = np.float32))
+
+def merged_vertices(parts):
+    """All given vertex arrays concatenated to one (positions, colors), None if there are no vertices"""
+    parts = [part for part in parts if len(part[0])]
+    if not parts:
+        return None
+    positions = np.concatenate([part[0] for part in parts])
+    colors = np.concatenate([part[1] for part in parts])
+    return (positions, colors)
+
+def merged_batch(shader, type, vertices):
+    if vertices is None:
+        return None
+    return batch_for_shader(shader, type, {"pos": vertices[0], "color": vertices[1]})
+
+def overlay_vertices(self, path_parts):
+    """
+    Vertex arrays of whole overlay: path with control faces (triangles or lines),
+    and control points. Parts are vertex arrays of path segments. Needs no GPU context
+    """
+    faces, points = control_point_vertices(self)
+    if self.mesh_elements == "faces":
+        path_parts = path_parts + [faces]
+    return merged_vertices(path_parts), merged_vertices([points])
+
+def create_overlay_batches(self, path_parts):
+    """Whole overlay in two batches, see overlay_vertices"""
+    path, points = overlay_vertices(self, path_parts)
+    path_type = 'TRIS' if self.mesh_elements == "faces" else 'LINES'
+    self.batch_path = merged_batch(self.shader, path_type, path)
+    self.batch_points = merged_batch(self.shader, 'POINTS', points)
+
+def set_draw_state(self):
+    """State for overlay drawing, gpu.state module if Blender has it"""
+    if hasattr(gpu, "state"):
+        gpu.state.blend_set('ALPHA')
+        gpu.state.depth_test_set('ALWAYS')
+        gpu.state.point_size_set(self.vertex_size)
+        gpu.state.line_width_set(self.edge_width)
+    else:
+        bgl.glPointSize(self.vertex_size)
+        bgl.glLineWidth(self.edge_width)
+        bgl.glEnable(bgl.GL_LINE_SMOOTH)
+        bgl.glBlendFunc(bgl.GL_SRC_ALPHA, bgl.GL_ONE_MINUS_SRC_ALPHA)
+        bgl.glEnable(bgl.GL_BLEND)
+        bgl.glEnable(bgl.GL_DEPTH_TEST)
+        bgl.glDepthFunc(bgl.GL_ALWAYS)
+
+def reset_draw_state(self):
+    """Restore state changed by set_draw_state to Blender defaults"""
+    if hasattr(gpu, "state"):
+        gpu.state.blend_set('NONE')
+        gpu.state.depth_test_set('NONE')
+        gpu.state.point_size_set(1.0)
+        gpu.state.line_width_set(1.0)
+    else:
+        bgl.glPointSize(1.0)
+        bgl.glLineWidth(1.0)
+        bgl.glDisable(bgl.GL_LINE_SMOOTH)
+        bgl.glDisable(bgl.GL_BLEND)
+        bgl.glDepthFunc(bgl.GL_LEQUAL)
+        bgl.glDisable(bgl.GL_DEPTH_TEST)
+
+@profiled("draw", latest = True)
+def draw_callback_3d(self, op, context):
+    start = perf_counter()
+    batches = [batch for batch in (self.batch_path, self.batch_points) if batch]
+    if batches:
+        set_draw_state(self)
+        # Batches are in object space, object transform goes to shader with model view matrix
+        with gpu.matrix.push_pop():
+            gpu.matrix.multiply_matrix(bpy.context.active_object.matrix_world)
+            self.shader.bind()
+            for batch in batches:
+                batch.draw(self.shader)
+        reset_draw_state(self)
+
+    # Overlay cost on CPU per redraw, smoothed
+    self.draw_calls = len(batches)
+    self.draw_time = 0.9 * self.draw_time + 0.1 * (perf_counter() - start)
+
+def draw_callback_2d(self, op, context):
+    """Milliseconds per stage of last event in region corner"""
+    font_id = 0
+    blf.size(font_id, 12, 72)
+    blf.color(font_id, 1.0, 1.0, 1.0, 0.9)
+    stages = profiler.stages
+    y = 20
+    for stage, seconds in sorted(profiler.last_event.items(), reverse = True):
+        blf.position(font_id, 20, y, 0)
+        blf.draw(font_id, "%-12s %7.2f ms   p90 %7.2f ms" % (stage, seconds * 1000.0,
+                                                           stages[stage].percentile(0.9) * 1000.0))
+        y += 16
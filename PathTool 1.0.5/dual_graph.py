@@ -0,0 +1,127 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+"""
+Face dual graph built from mesh loop arrays. Faces are nodes placed at face centers,
+connected through shared edges, and optionally through shared vertices.
+Memory per face: offset, center and island label (4 + 24 + 4 bytes),
+plus 16 bytes (neighbor, edge, length) for both directions of every connection.
+"""
+
+import numpy as np
+
+from array import array
+
+from .graph import MeshGraph
+
+def as_array(typecode, values):
+    """Copy numpy array to compact array.array of given type"""
+    dtype = np.int32 if typecode == 'i' else np.float64
+    return array(typecode, np.ascontiguousarray(values, dtype = dtype).tobytes())
+
+def shared_pairs(keys, values):
+    """Every pair of values with same key once, with that key: (values a, values b, keys)"""
+    order = np.argsort(keys, kind = "stable")
+    keys = keys[order]
+    values = values[order]
+    _, counts = np.unique(keys, return_counts = True)
+    sizes = np.repeat(counts, counts)
+    pairs_a, pairs_b, pair_keys = [], [], []
+    # Elements of one key are neighbours after sort, offset d pairs every element with d-th next one.
+    # Only groups larger than d are kept for pass d, so high valence keys don't rescan whole array
+    for d in range(1, len(keys)):
+        large = sizes > d
+        if not large.all():
+            keys, values, sizes = keys[large], values[large], sizes[large]
+        if len(keys) == 0:
+            break
+        same = (keys[d:] == keys[:-d])
+        pairs_a.append(values[:-d][same])
+        pairs_b.append(values[d:][same])
+        pair_keys.append(keys[d:][same])
+    if not pairs_a:
+        empty = np.empty(0, dtype = np.int32)
+        return empty, empty, empty
+    pairs_a, pairs_b, pair_keys = (np.concatenate(p) for p in (pairs_a, pairs_b, pair_keys))
+    # Face using same vertex twice
+    valid = pairs_a != pairs_b
+    return pairs_a[valid], pairs_b[valid], pair_keys[valid]
+
+def csr_graph(mode, coords, pairs_a, pairs_b, pair_links, num_elements):
+    """MeshGraph from undirected pairs, same layout as MeshGraph.from_pairs"""
+    num_nodes = len(coords)
+    sources = np.concatenate((pairs_a, pairs_b))
+    targets = np.concatenate((pairs_b, pairs_a))
+    links = np.concatenate((pair_links, pair_links))
+    order = np.argsort(sources, kind = "stable")
+    sources, targets, links = sources[order], targets[order], links[order]
+
+    offsets = np.zeros(num_nodes + 1, dtype = np.int32)
+    np.cumsum(np.bincount(sources, minlength = num_nodes), out = offsets[1:])
+    weights = np.linalg.norm(coords[sources] - coords[targets], axis = 1)
+
+    return MeshGraph(mode, as_array('i', offsets), as_array('i', targets), as_array('i', links),
+                     as_array('d', weights), as_array('d', coords.ravel()), num_elements)
+
+def build_face_graph(mesh, hidden_faces, connectivity = "EDGE"):
+    """
+    Face graph of mesh, hidden faces are not connected, None - read hidden state from mesh.
+    Connectivity "EDGE" - faces sharing edge, "VERTEX" - faces sharing vertex,
+    link of faces touching only by vertex is -1
+    """
+    num_faces = len(mesh.polygons)
+    if hidden_faces is None:
+        hidden_faces = np.empty(num_faces, dtype = bool)
+        mesh.polygons.foreach_get("hide", hidden_faces)
+    loop_start = np.empty(num_faces, dtype = np.int32)
+    mesh.polygons.foreach_get("loop_start", loop_start)
+    loop_total = np.empty(num_faces, dtype = np.int32)
+    mesh.polygons.foreach_get("loop_total", loop_total)
+    centers = np.empty(num_faces * 3, dtype = np.float32)
+    mesh.polygons.foreach_get("center", centers)
+    centers = centers.astype(np.float64).reshape(-1, 3)
+
+    loop_edges = np.empty(len(mesh.loops), dtype = np.int32)
+    mesh.loops.foreach_get("edge_index", loop_edges)
+
+    # Face of every loop
+    by_start = np.argsort(loop_start, kind = "stable").astype(np.int32)
+    loop_faces = np.repeat(by_start, loop_total[by_start])
+    visible = ~np.asarray(hidden_faces, dtype = bool)[loop_faces]
+    loop_faces = loop_faces[visible]
+
+    pairs_a, pairs_b, pair_links = shared_pairs(loop_edges[visible], loop_faces)
+
+    if connectivity == "VERTEX":
+        loop_verts = np.empty(len(mesh.loops), dtype = np.int32)
+        mesh.loops.foreach_get("vertex_index", loop_verts)
+        vert_a, vert_b, _ = shared_pairs(loop_verts[visible], loop_faces)
+        pairs_a = np.concatenate((pairs_a, vert_a))
+        pairs_b = np.concatenate((pairs_b, vert_b))
+        pair_links = np.concatenate((pair_links, np.full(len(vert_a), -1, dtype = np.int32)))
+
+        # Keep one connection of every face pair, edge connections are first
+        keys = (np.minimum(pairs_a, pairs_b).astype(np.int64) * num_faces +
+                np.maximum(pairs_a, pairs_b))
+        _, first = np.unique(keys, return_index = True)
+        first.sort()
+        pairs_a, pairs_b, pair_links = pairs_a[first], pairs_b[first], pair_links[first]
+
+    return csr_graph("faces", centers, pairs_a, pairs_b, pair_links, num_faces)
@@ -0,0 +1,501 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+from array import array
+from collections import (namedtuple, OrderedDict)
+from hashlib import blake2b
+from heapq import heappush, heappop
+from math import (pi, sqrt)
+
+INF = float("inf")
+
+# nodes - ordered graph nodes from source to target (verts or faces)
+# links - ordered mesh edges traversed between nodes
+# visited - number of nodes settled by search
+PathResult = namedtuple("PathResult", ("nodes", "links", "visited"))
+
+class IndexPath:
+    """
+    Ordered set of element indices. Indices are kept in compact array
+    in insertion order, membership is tested by byte mask of all elements
+    """
+
+    def __init__(self, size, indices = ()):
+        self.indices = array('i')
+        self.mask = bytearray(size)
+        self.extend(indices)
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __iter__(self):
+        return iter(self.indices)
+
+    def __contains__(self, ii):
+        return bool(self.mask[ii])
+
+    def add(self, ii):
+        if not self.mask[ii]:
+            self.mask[ii] = 1
+            self.indices.append(ii)
+
+    def extend(self, indices):
+        mask = self.mask
+        append = self.indices.append
+        for ii in indices:
+            if not mask[ii]:
+                mask[ii] = 1
+                append(ii)
+
+class MeshGraph:
+    """
+    Compact CSR adjacency of mesh elements.
+    For "edges" mode nodes are vertices connected by edges,
+    for "faces" mode nodes are faces connected through shared edges.
+    Arrays can be array.array or memoryview of same type (graph loaded from disk)
+    """
+
+    def __init__(self, mode, offsets, neighbors, links, weights, coords, num_elements = None,
+                 islands = None, digest = None):
+        self.mode = mode
+        # digest - fingerprint stored with graph, saves hashing of loaded arrays
+        self.fingerprint = digest or fingerprint(mode, neighbors, links, coords)
+        self.offsets = offsets      # node -> first entry in neighbors, size nodes + 1
+        self.neighbors = neighbors  # adjacent nodes
+        self.links = links          # mesh edge index of each adjacency entry
+        self.weights = weights      # length of each adjacency entry
+        self.coords = coords        # node positions, 3 floats per node
+
+        # Number of mesh elements path indices refer to, edges or faces
+        if num_elements is None:
+            if mode == "edges":
+                num_elements = (max(links) + 1) if len(links) else 0
+            else:
+                num_elements = self.num_nodes
+        self.num_elements = num_elements
+
+        # Visited nodes per path node of recent A* searches, used by "AUTO" search
+        self.astar_ratio = 2.0
+        self._mean_weight = None
+        self._islands = islands
+
+    @property
+    def num_nodes(self):
+        return len(self.offsets) - 1
+
+    @property
+    def mean_weight(self):
+        """Average length of graph edge, 1.0 for graphs without edges or with only zero length edges"""
+        if self._mean_weight is None:
+            size = len(self.weights)
+            self._mean_weight = ((sum(self.weights) / size) if size else 0.0) or 1.0
+        return self._mean_weight
+
+    @property
+    def islands(self):
+        """Connected part label of every node"""
+        if self._islands is None:
+            self._islands = label_islands(self)
+        return self._islands
+
+    def same_island(self, a, b):
+        islands = self.islands
+        return islands[a] == islands[b]
+
+    def distance(self, a, b):
+        """Euclidean distance beetween two nodes"""
+        coords = self.coords
+        ax, ay, az = coords[3 * a:3 * a + 3]
+        bx, by, bz = coords[3 * b:3 * b + 3]
+        return sqrt((ax - bx) ** 2 + (ay - by) ** 2 + (az - bz) ** 2)
+
+    @classmethod
+    def from_pairs(cls, mode, coords, pairs_a, pairs_b, pair_links, num_elements = None):
+        """Build graph from undirected node pairs and node coordinates"""
+        num_nodes = len(coords) // 3
+        counts = array('i', bytes(4 * (num_nodes + 1)))
+        for a, b in zip(pairs_a, pairs_b):
+            counts[a + 1] += 1
+            counts[b + 1] += 1
+
+        offsets = array('i', counts)
+        for ii in range(num_nodes):
+            offsets[ii + 1] += offsets[ii]
+
+        size = offsets[-1]
+        neighbors = array('i', bytes(4 * size))
+        links = array('i', bytes(4 * size))
+        weights = array('d', bytes(8 * size))
+
+        fill = array('i', offsets[:-1])
+        for a, b, link in zip(pairs_a, pairs_b, pair_links):
+            ax, ay, az = coords[3 * a:3 * a + 3]
+            bx, by, bz = coords[3 * b:3 * b + 3]
+            length = sqrt((ax - bx) ** 2 + (ay - by) ** 2 + (az - bz) ** 2)
+
+            ii = fill[a]
+            neighbors[ii], links[ii], weights[ii] = b, link, length
+            fill[a] += 1
+            ii = fill[b]
+            neighbors[ii], links[ii], weights[ii] = a, link, length
+            fill[b] += 1
+
+        return cls(mode, offsets, neighbors, links, weights, coords, num_elements)
+
+def fingerprint(mode, *arrays):
+    """Hash of graph topology and coordinates"""
+    digest = blake2b(mode.encode(), digest_size = 16)
+    for arr in arrays:
+        digest.update(arr)
+    return digest.hexdigest()
+
+def build_graph(bm):
+    """
+    Build "edges" mode graph from bmesh: vertices connected by edges, hidden edges are skipped.
+    Face graphs are built by dual_graph.build_face_graph
+    """
+    for seq in (bm.verts, bm.edges):
+        seq.index_update()
+
+    coords = array('d')
+    pairs_a = array('i')
+    pairs_b = array('i')
+    pair_links = array('i')
+
+    for v in bm.verts:
+        coords.extend(v.co)
+    for edge in bm.edges:
+        if edge.hide:
+            continue
+        v1, v2 = edge.verts
+        pairs_a.append(v1.index)
+        pairs_b.append(v2.index)
+        pair_links.append(edge.index)
+
+    return MeshGraph.from_pairs("edges", coords, pairs_a, pairs_b, pair_links, len(bm.edges))
+
+def label_islands(graph):
+    """Label connected parts of graph with union-find, label is smallest node index of part"""
+    offsets, neighbors = graph.offsets, graph.neighbors
+    parent = array('i', range(graph.num_nodes))
+
+    for node in range(graph.num_nodes):
+        for ii in range(offsets[node], offsets[node + 1]):
+            other = neighbors[ii]
+            if other < node:
+                continue
+            # Find roots with path halving
+            a = node
+            while parent[a] != a:
+                parent[a] = parent[parent[a]]
+                a = parent[a]
+            b = other
+            while parent[b] != b:
+                parent[b] = parent[parent[b]]
+                b = parent[b]
+            if a < b:
+                parent[b] = a
+            elif b < a:
+                parent[a] = b
+
+    # Roots are smaller than their children, so one pass flattens all
+    for node in range(graph.num_nodes):
+        parent[node] = parent[parent[node]]
+    return parent
+
+def _trace(prev, prev_link, node):
+    """Walk back from node to search source"""
+    nodes = [node]
+    links = []
+    while node in prev:
+        links.append(prev_link[node])
+        node = prev[node]
+        nodes.append(node)
+    nodes.reverse()
+    links.reverse()
+    return nodes, links
+
+def dijkstra(graph, source, target):
+    """Shortest path beetween two nodes with binary heap Dijkstra search"""
+    if source == target:
+        return PathResult([source], [], 0)
+
+    offsets, neighbors = graph.offsets, graph.neighbors
+    links, weights = graph.links, graph.weights
+
+    dist = {source: 0.0}
+    prev = {}
+    prev_link = {}
+    settled = set()
+    heap = [(0.0, source)]
+
+    while heap:
+        d, node = heappop(heap)
+        if node in settled:
+            continue
+        settled.add(node)
+        if node == target:
+            nodes, path_links = _trace(prev, prev_link, node)
+            return PathResult(nodes, path_links, len(settled))
+
+        for ii in range(offsets[node], offsets[node + 1]):
+            other = neighbors[ii]
+            nd = d + weights[ii]
+            if nd < dist.get(other, INF):
+                dist[other] = nd
+                prev[other] = node
+                prev_link[other] = links[ii]
+                heappush(heap, (nd, other))
+
+    return PathResult([], [], len(settled))
+
+def astar(graph, source, target):
+    """Shortest path beetween two nodes with A* search, Euclidean distance to target as heuristic"""
+    if source == target:
+        return PathResult([source], [], 0)
+
+    offsets, neighbors = graph.offsets, graph.neighbors
+    links, weights, coords = graph.links, graph.weights, graph.coords
+    tx, ty, tz = coords[3 * target:3 * target + 3]
+
+    dist = {source: 0.0}
+    prev = {}
+    prev_link = {}
+    settled = set()
+    heap = [(graph.distance(source, target), 0.0, source)]
+
+    while heap:
+        _, d, node = heappop(heap)
+        if node in settled:
+            continue
+        settled.add(node)
+        if node == target:
+            nodes, path_links = _trace(prev, prev_link, node)
+            return PathResult(nodes, path_links, len(settled))
+
+        for ii in range(offsets[node], offsets[node + 1]):
+            other = neighbors[ii]
+            nd = d + weights[ii]
+            if nd < dist.get(other, INF):
+                dist[other] = nd
+                prev[other] = node
+                prev_link[other] = links[ii]
+                x, y, z = coords[3 * other:3 * other + 3]
+                h = sqrt((x - tx) ** 2 + (y - ty) ** 2 + (z - tz) ** 2)
+                heappush(heap, (nd + h, nd, other))
+
+    return PathResult([], [], len(settled))
+
+def bidirectional(graph, source, target):
+    """Shortest path beetween two nodes with Dijkstra search from both ends"""
+    if source == target:
+        return PathResult([source], [], 0)
+
+    offsets, neighbors = graph.offsets, graph.neighbors
+    links, weights = graph.links, graph.weights
+
+    dist = ({source: 0.0}, {target: 0.0})
+    prev = ({}, {})
+    prev_link = ({}, {})
+    settled = (set(), set())
+    heaps = ([(0.0, source)], [(0.0, target)])
+    best = INF
+    meet = None
+
+    while heaps[0] and heaps[1]:
+        if heaps[0][0][0] + heaps[1][0][0] >= best:
+            break
+        # Expand smaller frontier
+        side = 0 if len(heaps[0]) <= len(heaps[1]) else 1
+        d, node = heappop(heaps[side])
+        if node in settled[side]:
+            continue
+        settled[side].add(node)
+
+        side_dist, opposite_dist = dist[side], dist[1 - side]
+        for ii in range(offsets[node], offsets[node + 1]):
+            other = neighbors[ii]
+            nd = d + weights[ii]
+            if nd < side_dist.get(other, INF):
+                side_dist[other] = nd
+                prev[side][other] = node
+                prev_link[side][other] = links[ii]
+                heappush(heaps[side], (nd, other))
+            if other in opposite_dist:
+                total = side_dist[other] + opposite_dist[other]
+                if total < best:
+                    best = total
+                    meet = other
+
+    visited = len(settled[0]) + len(settled[1])
+    if meet is None:
+        return PathResult([], [], visited)
+
+    nodes, path_links = _trace(prev[0], prev_link[0], meet)
+    back_nodes, back_links = _trace(prev[1], prev_link[1], meet)
+    back_nodes.reverse()
+    back_links.reverse()
+    return PathResult(nodes + back_nodes[1:], path_links + back_links, visited)
+
+def choose_method(graph, source, target):
+    """
+    Choose search method by estimated number of visited nodes.
+    A* visits roughly path length times learned ratio,
+    bidirectional search visits two discs of half path length
+    """
+    hops = graph.distance(source, target) / graph.mean_weight
+    astar_cost = graph.astar_ratio * hops
+    bidirectional_cost = pi * hops * hops / 2.0
+    if astar_cost <= bidirectional_cost:
+        return "ASTAR"
+    return "BIDIRECTIONAL"
+
+class SegmentCache:
+    """
+    Bounded LRU cache of found paths, keyed by (endpoint A, endpoint B, mode).
+    Bound to fingerprint of graph, cleared when mesh topology or coordinates change
+    """
+
+    def __init__(self, max_size = 256):
+        self.max_size = max_size
+        self.fingerprint = None
+        self.segments = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.segments)
+
+    def resize(self, max_size):
+        self.max_size = max_size
+        while len(self.segments) > self.max_size:
+            self.segments.popitem(last = False)
+
+    def validate(self, graph):
+        """Drop all segments if they were found on another mesh state"""
+        if self.fingerprint != graph.fingerprint:
+            self.clear()
+            self.fingerprint = graph.fingerprint
+
+    def clear(self):
+        self.segments.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, source, target, mode):
+        key = (min(source, target), max(source, target), mode)
+        segment = self.segments.get(key)
+        if segment is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.segments.move_to_end(key)
+        nodes, links = segment
+        if source != key[0]:
+            nodes, links = nodes[::-1], links[::-1]
+        return PathResult(list(nodes), list(links), 0)
+
+    def put(self, source, target, mode, result):
+        key = (min(source, target), max(source, target), mode)
+        nodes, links = tuple(result.nodes), tuple(result.links)
+        if source != key[0]:
+            nodes, links = nodes[::-1], links[::-1]
+        self.segments[key] = (nodes, links)
+        self.segments.move_to_end(key)
+        if len(self.segments) > self.max_size:
+            self.segments.popitem(last = False)
+
+segment_cache = SegmentCache()
+
+def find_cached_path(graph, source, target, method = "AUTO"):
+    """Find shortest path beetween two nodes of graph, reusing segments found before"""
+    segment_cache.validate(graph)
+    result = segment_cache.get(source, target, graph.mode)
+    if result is None:
+        result = find_path(graph, source, target, method)
+        segment_cache.put(source, target, graph.mode, result)
+    return result
+
+def find_segment(graph, source, target, method = "AUTO"):
+    """
+    Indices of mesh elements on path beetween two control elements:
+    edges for "edges" mode, faces without control faces for "faces" mode
+    """
+    return segment_elements(graph, find_cached_path(graph, source, target, method))
+
+def segment_elements(graph, result):
+    """Mesh element indices of found path, as returned by find_segment"""
+    if graph.mode == "edges":
+        return array('i', result.links)
+    return array('i', result.nodes[1:-1])
+
+def find_path(graph, source, target, method = "AUTO"):
+    """
+    Find shortest path beetween two nodes of graph.
+    Method is one of "AUTO", "ASTAR", "BIDIRECTIONAL", "DIJKSTRA"
+    """
+    if not graph.same_island(source, target):
+        return PathResult([], [], 0)
+    if method == "AUTO":
+        method = choose_method(graph, source, target)
+
+    if method == "ASTAR":
+        result = astar(graph, source, target)
+        if result.nodes:
+            ratio = result.visited / len(result.nodes)
+            graph.astar_ratio = 0.8 * graph.astar_ratio + 0.2 * ratio
+        return result
+    elif method == "BIDIRECTIONAL":
+        return bidirectional(graph, source, target)
+    return dijkstra(graph, source, target)
+
+class GraphCache:
+    """
+    Bounded LRU cache of built graphs and other per mesh data, keyed by (mesh, name).
+    Entry is returned only while fingerprint of mesh state is the same
+    """
+
+    def __init__(self, max_size = 6):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        self.entries.clear()
+
+    def get(self, key, fingerprint):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] != fingerprint:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key, fingerprint, value):
+        self.entries[key] = (fingerprint, value)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last = False)
+
+graph_cache = GraphCache()
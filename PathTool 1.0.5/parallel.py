@@ -0,0 +1,200 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+"""
+Segment search in worker processes. Search is pure Python, so threads would wait on each other.
+Workers map graph file (disk cache or temporary one), adjacency is shared through OS page cache.
+Off by default: one process is used unless more are set in preferences.
+"""
+
+import atexit
+import multiprocessing
+import os
+import sys
+import tempfile
+
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from .disk_cache import (DiskGraphCache, load_graph)
+from .graph import (PathResult, find_path, find_segment, segment_cache, segment_elements)
+
+# Worker processes pay off only for enough long searches
+MIN_NODES = 50000
+MIN_SEGMENTS = 4
+
+TEMP_CACHE_BYTES = 1024 * 1024 * 1024
+
+# Runs first in worker: add-on package without its __init__, which needs bpy
+WORKER_INIT = """
+import sys, types
+package = types.ModuleType(%r)
+package.__path__ = [%r]
+sys.modules.setdefault(%r, package)
+"""
+
+_pool = None
+_pool_key = None
+_broken = False
+
+# Graph files written for workers, removed on shutdown
+_temp_files = set()
+
+# Graphs mapped by worker process, by file path
+_worker_graphs = dict()
+
+@contextmanager
+def hidden_main():
+    """
+    Spawned workers import __main__ of this process by its file or spec. In Blender it is
+    the script given with --python, which needs bpy, so it is hidden while workers are started
+    """
+    main = sys.modules.get("__main__")
+    if main is None:
+        yield
+        return
+    saved = {name: getattr(main, name) for name in ("__file__", "__spec__") if hasattr(main, name)}
+    if "__file__" in saved:
+        del main.__file__
+    main.__spec__ = None
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(main, name, value)
+        if "__spec__" not in saved:
+            del main.__spec__
+
+def get_pool(workers, executable):
+    """Process pool, kept between calls while number of workers is the same"""
+    global _pool, _pool_key
+    key = (workers, executable)
+    if _pool is None or _pool_key != key:
+        stop_pool()
+        context = multiprocessing.get_context("spawn")
+        if executable:
+            context.set_executable(executable)
+        package = __package__
+        package_dir = os.path.dirname(os.path.abspath(__file__))
+        _pool = ProcessPoolExecutor(workers, mp_context = context, initializer = exec,
+                                    initargs = (WORKER_INIT % (package, package_dir, package),))
+        _pool_key = key
+    return _pool
+
+def stop_pool():
+    global _pool, _pool_key
+    if _pool is not None:
+        _pool.shutdown(wait = True)
+    _pool = None
+    _pool_key = None
+
+def shutdown():
+    """Stop worker processes and remove graph files written for them"""
+    stop_pool()
+    for filepath in list(_temp_files):
+        try:
+            os.remove(filepath)
+        except OSError:
+            continue
+        _temp_files.discard(filepath)
+
+atexit.register(shutdown)
+
+def graph_file(graph):
+    """File of graph for workers, graphs not from disk cache are written to temporary directory"""
+    filepath = getattr(graph, "filepath", None)
+    if filepath and os.path.isfile(filepath):
+        return filepath
+    cache = DiskGraphCache(os.path.join(tempfile.gettempdir(), "path_tool_graphs"), TEMP_CACHE_BYTES)
+    if not cache.put("%s_%s" % (graph.mode, graph.fingerprint), graph):
+        return None
+    _temp_files.add(graph.filepath)
+    return graph.filepath
+
+def search_task(filepath, pairs, method):
+    """Called in worker process: paths beetween node pairs as (nodes, links)"""
+    graph = _worker_graphs.get(filepath)
+    if graph is None:
+        graph = _worker_graphs[filepath] = load_graph(filepath)
+    results = []
+    for source, target in pairs:
+        result = find_path(graph, source, target, method)
+        results.append((array('i', result.nodes), array('i', result.links)))
+    return results
+
+def find_segments(graph, pairs, method = "AUTO", workers = 1, executable = None):
+    """
+    Segments beetween node pairs, same as find_segment for every pair, in given order.
+    Searches missing in segment cache are split beetween worker processes on large graphs,
+    workers - number of processes, 0 - number of CPUs, 1 - search in this process
+    """
+    workers = min(workers or os.cpu_count() or 1, len(pairs))
+    if workers < 2 or _broken or len(pairs) < MIN_SEGMENTS or graph.num_nodes < MIN_NODES:
+        return [find_segment(graph, source, target, method) if source != target else array('i')
+                for source, target in pairs]
+
+    segments = [None] * len(pairs)
+    todo = []
+    segment_cache.validate(graph)
+    for ii, (source, target) in enumerate(pairs):
+        if source == target:
+            segments[ii] = array('i')
+            continue
+        result = segment_cache.get(source, target, graph.mode)
+        if result is None:
+            todo.append(ii)
+        else:
+            segments[ii] = segment_elements(graph, result)
+
+    results = search_in_workers(graph, [pairs[ii] for ii in todo], method, min(workers, len(todo)),
+                                executable)
+    for ii, result in zip(todo, results):
+        if result is None:
+            result = find_path(graph, pairs[ii][0], pairs[ii][1], method)
+        segment_cache.put(pairs[ii][0], pairs[ii][1], graph.mode, result)
+        segments[ii] = segment_elements(graph, result)
+    return segments
+
+def search_in_workers(graph, pairs, method, workers, executable):
+    """Found paths in order of pairs, None for every pair if workers could not be used"""
+    global _broken
+    results = [None] * len(pairs)
+    if workers < 2:
+        return results
+    try:
+        filepath = graph_file(graph)
+        if filepath is None:
+            return results
+        chunks = [list(range(len(pairs)))[ii::workers] for ii in range(workers)]
+        # Processes are started on submit
+        with hidden_main():
+            pool = get_pool(workers, executable)
+            futures = [pool.submit(search_task, filepath, [pairs[jj] for jj in chunk], method)
+                       for chunk in chunks]
+        for chunk, future in zip(chunks, futures):
+            for jj, (nodes, links) in zip(chunk, future.result()):
+                results[jj] = PathResult(nodes, links, 0)
+    except Exception:
+        # Processes can't be started here, stay with search in this process
+        _broken = True
+        shutdown()
+        results = [None] * len(pairs)
+    return results
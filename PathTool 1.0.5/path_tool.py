@@ -22,7 +22,108 @@ import bpy
 import bmesh
 
 from .utils import PathUtils, PathUndo
-from .draw_utils import (create_batch_control_points, create_batch_path, draw_callback_3d)
+from .apply_utils import apply_path
+from .graph import segment_cache
+from .profiling import profiler
+
+# Configurable actions: (name, operator event handler, default keys, status bar hint)
+KEY_BINDINGS = (
+    ("confirm", "event_confirm", "RET, NUMPAD_ENTER, SPACE", "confirm path"),
+    ("cancel", "event_cancel", "ESC", "cancel"),
+    ("add", "event_press", "LEFTMOUSE", "add point"),
+    ("remove", "event_remove_press", "ctrl+LEFTMOUSE, LEFTMOUSE:DOUBLE_CLICK", "remove control point"),
+    ("menu", "event_menu", "RIGHTMOUSE", "open context menu"),
+    ("reverse", "event_reverse", "alt+LEFT_ALT, alt+RIGHT_ALT", "reverse active point to other side"),
+    ("fill_gap", "event_fill_gap", "C", "toogle fill cap"),
+    ("undo", "event_undo", "ctrl+Z", "undo"),
+    ("redo", "event_redo", "ctrl+alt+Z", "redo"),
+)
+
+def parse_keys(text):
+    """
+    Event keys (alt, ctrl, shift, type, value) of comma separated key combinations,
+    like "ctrl+alt+Z, LEFTMOUSE:DOUBLE_CLICK". Value is PRESS if not given
+    """
+    event = bpy.types.Event.bl_rna.properties
+    types = event["type"].enum_items.keys()
+    values = event["value"].enum_items.keys()
+    keys = []
+    for combo in text.split(","):
+        combo, _, value = combo.strip().partition(":")
+        *mods, key = combo.split("+")
+        mods = {mod.strip().lower() for mod in mods}
+        key = key.strip().upper()
+        value = value.strip().upper() or 'PRESS'
+        if mods - {"alt", "ctrl", "shift"} or key not in types or value not in values:
+            raise ValueError("Unknown key combination: %r" % combo)
+        keys.append(("alt" in mods, "ctrl" in mods, "shift" in mods, key, value))
+    return keys
+
+def build_event_map(bindings = None):
+    """
+    Map of event keys (alt, ctrl, shift, type, value) to operator event handlers.
+    Bindings - action name to keys text, default keys are used for missing or wrong ones
+    """
+    bindings = bindings or dict()
+    events = dict()
+    # View navigation goes to viewport, unless key is used by tool
+    for n in range(10):
+        for mods in ((False, False, False), (False, False, True), (False, True, False)):
+            events[mods + ('NUMPAD_%d' % n, 'PRESS')] = "event_pass_through"
+    for evkey in ((False, False, False, 'MIDDLEMOUSE', 'PRESS'),
+                  (False, True, False, 'MIDDLEMOUSE', 'PRESS'),
+                  (False, False, True, 'MIDDLEMOUSE', 'PRESS'),
+                  (False, False, False, 'WHEELDOWNMOUSE', 'PRESS'),
+                  (False, False, False, 'WHEELUPMOUSE', 'PRESS'),
+                  (False, False, False, 'NUMPAD_PERIOD', 'PRESS'),
+                  (False, False, True, 'C', 'PRESS')):
+        events[evkey] = "event_pass_through"
+
+    release_types = set()
+    for action, handler, default, hint in KEY_BINDINGS:
+        try:
+            keys = parse_keys(bindings.get(action, default))
+        except ValueError:
+            keys = parse_keys(default)
+        for evkey in keys:
+            events[evkey] = handler
+            if action in ("add", "remove"):
+                release_types.add(evkey[3])
+
+    # Mouse buttons of add and remove end press or drag, with any modifiers
+    for key in release_types:
+        for mods in range(8):
+            evkey = (bool(mods & 1), bool(mods & 2), bool(mods & 4), key, 'RELEASE')
+            events.setdefault(evkey, "event_release")
+    return events
+
+def key_bindings(prefs = None):
+    """Action name to keys text from add-on preferences, wrong keys are replaced by default ones"""
+    bindings = dict()
+    for action, handler, default, hint in KEY_BINDINGS:
+        text = getattr(prefs, "key_" + action, default)
+        try:
+            parse_keys(text)
+        except ValueError:
+            text = default
+        bindings[action] = text
+    return bindings
+
+def status_text(bindings):
+    """Status bar help for given bindings"""
+    return ", ".join("%s: %s" % (bindings[action], hint) for action, handler, default, hint in KEY_BINDINGS)
+
+# Filled at registration from add-on preferences, updated when keys are changed
+EVENT_MAP = dict()
+STATUS_TEXT = ""
+
+def load_event_map(prefs = None):
+    """Rebuild event map in place from add-on preferences"""
+    global STATUS_TEXT
+    bindings = key_bindings(prefs)
+    EVENT_MAP.clear()
+    EVENT_MAP.update(build_event_map(bindings))
+    STATUS_TEXT = status_text(bindings)
 
 class VIEW3D_OT_select_path(bpy.types.Operator, PathUtils, PathUndo):
     bl_idname = "view3d.select_path"
@@ -110,97 +211,44 @@ class VIEW3D_OT_select_path(bpy.types.Operator, PathUtils, PathUndo):
     def invoke(self, context, event):
         self.create_bmesh(context)
         self.mesh_select_mode(context)
+        self.create_buffers(context)
         self.set_properties(context)
+        if self.profiling:
+            profiler.start_session()
+        self.create_graph()
+        self.create_bvh()
         if not self.chech_first_click(context, event):
             return {'CANCELLED'}
         PathUndo.__init__(self)
         self.register_handlers((self, context, event), context)
 
-        context.workspace.status_text_set("Enter/Space: confirm path, Esc: cancel, LMB: add point, " \
-                                          "RMB: Open context menu, LMB+Ctrl: remove control point, " \
-                                          "Alt: reverse active point to other side, C: toogle fill cap, " \
-                                          "Ctrl+Z: undo, Ctrl+Alt+Z: redo")
+        if not EVENT_MAP:
+            load_event_map()
+        context.workspace.status_text_set(STATUS_TEXT)
 
         self.modal(context, event)
 
         return {'RUNNING_MODAL'}
 
     def modal(self, context, event):
-        if context.area:
-            context.area.tag_redraw()
-
         evkey = (event.alt, event.ctrl, event.shift, event.type, event.value)
+        handler = EVENT_MAP.get(evkey)
 
-        nnume = []
-        for n in range(10):
-            nnume.append((False, False, False, 'NUMPAD_%d' % n, 'PRESS'))
-            nnume.append((False, False, True, 'NUMPAD_%d' % n, 'PRESS'))
-            nnume.append((False, True, False, 'NUMPAD_%d' % n, 'PRESS'))
-        if evkey in nnume:
-            return {'PASS_THROUGH'}
-        elif evkey in (
-                (False, False, False, 'MIDDLEMOUSE', 'PRESS'),
-                (False, True, False, 'MIDDLEMOUSE', 'PRESS'),
-                (False, False, True, 'MIDDLEMOUSE', 'PRESS'),
-                (False, False, False, 'WHEELDOWNMOUSE', 'PRESS'),
-                (False, False, False, 'WHEELUPMOUSE', 'PRESS'),
-                (False, False, False, 'NUMPAD_PERIOD', 'PRESS'),
-                (False, False, True, 'C', 'PRESS')
-        ):
-            return {'PASS_THROUGH'}
-
-        elif evkey == (False, False, False, 'ESC', 'PRESS'):
-            self.cancel(context)
-            return {'CANCELLED'}
-
-        elif evkey in ((False, False, False, 'RET', 'PRESS'),
-                       (False, False, False, 'NUMPAD_ENTER', 'PRESS'),
-                       (False, False, False, 'SPACE', 'PRESS')) or self.confirm_path:
-            self.prepare_for_execute(context)
-            self.execute(context)
-            self.unregister_handlers(context)
-            return {'FINISHED'}
-
-        elif evkey == (False, False, False, 'LEFTMOUSE', 'PRESS'):
-            self.mouse_press = True
-
-        elif evkey in ((False, True, False, 'LEFTMOUSE', 'PRESS'),
-                       (False, False, False, 'LEFTMOUSE', 'DOUBLE_CLICK')):
-            self.mouse_remove = True
-            self.mouse_press = False
+        if handler is None and self.is_idle:
+            return {'RUNNING_MODAL'}
+        profiler.begin_event()
 
-        elif evkey in ((False, False, False, 'LEFTMOUSE', 'RELEASE'),
-                       (False, True, False, 'LEFTMOUSE', 'RELEASE')):
-            self.drag = False
-            self.mouse_press = False
-            self.mouse_remove = False
-            self.register_undo_step()
-            self.check_doubles(context)
-            self.drag_element = None
-            self.drag_element_index = None
+        if handler:
+            ret = getattr(self, handler)(context, event)
+            if ret:
+                return ret
 
-
-        elif evkey in ((True, False, False, 'LEFT_ALT', 'PRESS'),
-                       (True, False, False, 'RIGHT_ALT', 'PRESS')):
-            if self.fill_gap == False:
-                self.mouse_reverse = True
-
-        elif evkey == (False, True, False, 'Z', 'PRESS') or self.undo_one:
-            self.undo_one = False
-            return self.undo(context)
-
-        elif evkey == (True, True, False, 'Z', 'PRESS') or self.redo_one:
-            self.redo_one = False
-            self.redo()
-
-        elif evkey == (False, False, False, 'C', 'PRESS'):
-            self.fill_gap = (not self.fill_gap)
-            self.update_fill_path()
-
-
-        elif evkey == (False, False, False, 'RIGHTMOUSE', 'PRESS'):
-            wm = context.window_manager
-            wm.popover(self.popover_draw, ui_units_x = 12)
+        if self.confirm_path:
+            return self.event_confirm(context, event)
+        elif self.undo_one:
+            return self.event_undo(context, event)
+        elif self.redo_one:
+            self.event_redo(context, event)
 
         if self.mouse_reverse == True:
             self.switch_direction()
@@ -211,15 +259,24 @@ class VIEW3D_OT_select_path(bpy.types.Operator, PathUtils, PathUndo):
                 self.on_click(elem, True)
 
         if self.mouse_press:
-            elem = self.get_element_by_mouse(context, event)
-            if elem:
-                if evkey == (False, False, False, 'MOUSEMOVE', 'PRESS'):
-                    self.drag = True
-
-                if self.drag == True:
-                    self.drag_element_by_mouse(elem)
-                else:
-                    self.on_click(elem, False)
+            if self.drag == True:
+                # Mouse moves are only queued, latest one processed by timer
+                if event.type == 'MOUSEMOVE':
+                    self.queue_drag(event)
+                elif event.type == 'TIMER':
+                    self.process_drag(context)
+            elif event.type != 'TIMER':
+                elem = self.get_element_by_mouse(context, event)
+                if elem:
+                    if evkey == (False, False, False, 'MOUSEMOVE', 'PRESS'):
+                        self.drag = True
+                        self.drag_location = (event.mouse_region_x, event.mouse_region_y)
+                        self.add_drag_timer(context)
+
+                    if self.drag == True:
+                        self.drag_element_by_mouse(elem)
+                    else:
+                        self.on_click(elem, False)
 
         self.mouse_reverse = False
 
@@ -233,52 +290,79 @@ class VIEW3D_OT_select_path(bpy.types.Operator, PathUtils, PathUndo):
                 for attr in ("mark_select", "mark_seam", "mark_sharp"):
                     setattr(tool_props, attr, getattr(self, attr))
 
-            self.update_fill_path()
-            self.create_batches()
-
-        self.set_selection(self.original_select)
-        self.bm.select_flush_mode()
+            self.dirty_path = True
 
+        self.update_dirty(context)
         return {'RUNNING_MODAL'}
 
-    def execute(self, context):
+    @property
+    def is_idle(self):
+        """Nothing is pressed and no changes from user interface are pending"""
+        return not (self.mouse_press or self.mouse_remove or self.mouse_reverse or
+                    self.should_update or self.confirm_path or self.undo_one or self.redo_one)
+
+    def event_pass_through(self, context, event):
+        return {'PASS_THROUGH'}
+
+    def event_cancel(self, context, event):
+        self.cancel(context)
         if context.area:
             context.area.tag_redraw()
+        return {'CANCELLED'}
 
-        self.create_bmesh(context)
+    def event_confirm(self, context, event):
+        self.prepare_for_execute(context)
+        self.execute(context)
+        self.unregister_handlers(context)
+        return {'FINISHED'}
 
-        elems = getattr(self.bm, self.mesh_elements)
-        path = [elem for elem
-                in elems if elem.index in self.path_indices]
-        for elem in path:
-            if self.mark_select == "Extend":
-                elem.select_set(True)
-            elif self.mark_select == "Subtract":
-                elem.select_set(False)
-            elif self.mark_select == "Invert":
-                elem.select_set((not elem.select))
-        if self.mesh_elements == "edges":
-            edges = path
-        if self.mesh_elements == "faces":
-            edges = []
-            for elem in path:
-                for edge in elem.edges:
-                    if not edge in edges:
-                        edges.append(edge)
-        for elem in edges:
-            if self.mark_seam == "Mark":
-                elem.seam = True
-            elif self.mark_seam == "Clear":
-                elem.seam = False
-            elif self.mark_seam == "Toogle":
-                elem.seam = (not elem.seam)
-
-            if self.mark_sharp == "Mark":
-                elem.smooth = False
-            elif self.mark_sharp == "Clear":
-                elem.smooth = True
-            elif self.mark_sharp == "Toogle":
-                elem.smooth = (not elem.smooth)
+    def event_press(self, context, event):
+        self.mouse_press = True
+
+    def event_remove_press(self, context, event):
+        self.mouse_remove = True
+        self.mouse_press = False
+
+    def event_release(self, context, event):
+        self.end_drag(context)
+        self.mouse_press = False
+        self.mouse_remove = False
+        self.register_undo_step()
+        self.check_doubles(context)
+        self.drag_element = None
+        self.drag_element_index = None
+
+    def event_reverse(self, context, event):
+        if self.fill_gap == False:
+            self.mouse_reverse = True
+
+    def event_undo(self, context, event):
+        self.undo_one = False
+        ret = self.undo(context)
+        if 'RUNNING_MODAL' in ret:
+            self.update_dirty(context)
+        return ret
+
+    def event_redo(self, context, event):
+        self.redo_one = False
+        self.redo()
+
+    def event_fill_gap(self, context, event):
+        self.fill_gap = (not self.fill_gap)
+        self.dirty_path = True
+
+    def event_menu(self, context, event):
+        wm = context.window_manager
+        wm.popover(self.popover_draw, ui_units_x = 12)
+
+    def execute(self, context):
+        if context.area:
+            context.area.tag_redraw()
+
+        with profiler.stage("execute"):
+            self.create_bmesh(context)
+            apply_path(self.bm, self.mesh_elements, self.path_indices,
+                       self.mark_select, self.mark_seam, self.mark_sharp)
 
         tools = bpy.context.workspace.tools
         tool = tools.from_space_view3d_mode('EDIT_MESH', create = False)
@@ -334,6 +418,9 @@ class VIEW3D_OT_select_path(bpy.types.Operator, PathUtils, PathUndo):
         srow.enabled = (len(self.redo_history) > 0)
         srow.prop(self, "redo_one", icon = 'LOOP_FORWARDS')
 
+        col.label(text = "Segment cache: %d hits, %d misses" % (segment_cache.hits, segment_cache.misses))
+        col.label(text = "Overlay: %.2f ms per redraw, %d draw calls" % (self.draw_time * 1000.0, self.draw_calls))
+
         label = "Apply Path"
         row = col.row()
         row.scale_y = 1.5
@@ -0,0 +1,163 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+import functools
+import json
+import tracemalloc
+
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from time import perf_counter
+
+# Upper bounds of histogram buckets, milliseconds
+HISTOGRAM_BOUNDS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0, 50.0, 100.0, 250.0, 500.0, 1000.0)
+
+class StageTimes:
+    """Timings of one stage: rolling window for percentiles and histogram of whole session"""
+
+    def __init__(self, window):
+        self.samples = deque(maxlen = window)
+        self.histogram = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.histogram[bisect_left(HISTOGRAM_BOUNDS, seconds * 1000.0)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q):
+        """Percentile of rolling window in seconds, q in 0..1"""
+        if not self.samples:
+            return 0.0
+        samples = sorted(self.samples)
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def summary(self):
+        """Return's stage statistics in milliseconds"""
+        labels = ["<=%gms" % bound for bound in HISTOGRAM_BOUNDS] + [">%gms" % HISTOGRAM_BOUNDS[-1]]
+        return {
+            "count": self.count,
+            "total": self.total * 1000.0,
+            "mean": self.total * 1000.0 / max(1, self.count),
+            "p50": self.percentile(0.5) * 1000.0,
+            "p90": self.percentile(0.9) * 1000.0,
+            "p99": self.percentile(0.99) * 1000.0,
+            "max": self.max * 1000.0,
+            "histogram": dict(zip(labels, self.histogram)),
+        }
+
+class Profiler:
+    """Per stage timers of tool hot paths, disabled by default"""
+
+    def __init__(self, window = 512):
+        self.window = window
+        self.enabled = False
+        self.own_tracemalloc = False
+        self.clear()
+
+    def clear(self):
+        self.stages = dict()
+        self.last_event = dict()
+
+    def start_session(self):
+        """Forget timings and memory peak of previous tool runs"""
+        self.clear()
+        # Python before 3.9 can't reset peak
+        if tracemalloc.is_tracing() and hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+
+    def enable(self, enabled = True):
+        """Turn timers and memory tracing on or off"""
+        self.enabled = enabled
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.own_tracemalloc = True
+        elif not enabled and self.own_tracemalloc:
+            tracemalloc.stop()
+            self.own_tracemalloc = False
+
+    def begin_event(self):
+        """Forget stage times of previous event"""
+        self.last_event = dict()
+
+    def record(self, stage, seconds, latest = False):
+        """Add stage time, latest - last event shows only latest time instead of sum"""
+        times = self.stages.get(stage)
+        if times is None:
+            times = self.stages[stage] = StageTimes(self.window)
+        times.add(seconds)
+        if latest:
+            self.last_event[stage] = seconds
+        else:
+            self.last_event[stage] = self.last_event.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, stage):
+        """Time block of code as given stage"""
+        if not self.enabled:
+            yield
+            return
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, perf_counter() - start)
+
+    def report(self):
+        """Return's dictionary with all stage statistics and memory usage"""
+        current, peak = (0, 0)
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+        return {
+            "unit": "ms",
+            "window": self.window,
+            "stages": {stage: times.summary() for stage, times in self.stages.items()},
+            "memory_current": current,
+            "memory_peak": peak,
+        }
+
+    def export(self, filepath):
+        with open(filepath, "w") as f:
+            json.dump(self.report(), f, indent = 2)
+
+profiler = Profiler()
+
+def profiled(stage, latest = False):
+    """
+    Decorator recording time of function as given stage while profiler is enabled.
+    Latest - for functions not called by events, like draw callbacks, which run on every redraw
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.record(stage, perf_counter() - start, latest)
+        return wrapper
+    return decorator
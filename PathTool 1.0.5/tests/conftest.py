@@ -0,0 +1,62 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+"""
+Tests of modules which run without Blender: graph, dual_graph, disk_cache, undo_utils.
+"PathTool" package is registered by conftest.py in repository root.
+"""
+
+import random
+
+from array import array
+
+import pytest
+
+from PathTool.graph import MeshGraph
+
+def grid_pairs(n, m, offset = 0, link_offset = 0):
+    """Vertex pairs and edge indices of n x m grid of vertices"""
+    pairs_a, pairs_b, links = array('i'), array('i'), array('i')
+    for j in range(m):
+        for i in range(n):
+            v = offset + j * n + i
+            if i + 1 < n:
+                pairs_a.append(v)
+                pairs_b.append(v + 1)
+                links.append(link_offset + len(links))
+            if j + 1 < m:
+                pairs_a.append(v)
+                pairs_b.append(v + n)
+                links.append(link_offset + len(links))
+    return pairs_a, pairs_b, links
+
+@pytest.fixture
+def make_grid():
+    """Factory of "edges" graphs of vertex grids, jitter moves vertices randomly in plane"""
+    def make(n, m = None, jitter = 0.0, seed = 0):
+        m = m or n
+        rng = random.Random(seed)
+        coords = array('d')
+        for j in range(m):
+            for i in range(n):
+                coords.extend((i + rng.uniform(-jitter, jitter), j + rng.uniform(-jitter, jitter), 0.0))
+        pairs_a, pairs_b, links = grid_pairs(n, m)
+        return MeshGraph.from_pairs("edges", coords, pairs_a, pairs_b, links)
+    return make
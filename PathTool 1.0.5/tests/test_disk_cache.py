@@ -0,0 +1,66 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+import os
+
+import pytest
+
+from PathTool.disk_cache import SECTIONS, DiskGraphCache, load_graph, save_graph
+
+def test_saved_graph_loads_equal(make_grid, tmp_path):
+    graph = make_grid(6, 5, jitter = 0.2)
+    filepath = str(tmp_path / "grid.ptgraph")
+    save_graph(graph, filepath)
+    loaded = load_graph(filepath)
+    for name, _ in SECTIONS:
+        assert list(getattr(loaded, name)) == list(getattr(graph, name))
+    assert loaded.mode == graph.mode
+    assert loaded.num_elements == graph.num_elements
+    assert loaded.fingerprint == graph.fingerprint
+    assert loaded.same_island(0, 29)
+    assert os.listdir(str(tmp_path)) == ["grid.ptgraph"]
+
+def test_cache_miss_and_hit(make_grid, tmp_path):
+    cache = DiskGraphCache(str(tmp_path / "cache"), 1 << 20)
+    assert cache.get("missing") is None
+    graph = make_grid(4)
+    assert cache.put("grid", graph)
+    assert cache.get("grid").fingerprint == graph.fingerprint
+
+def test_broken_file_is_removed(tmp_path):
+    cache = DiskGraphCache(str(tmp_path), 1 << 20)
+    filepath = cache.filepath("broken")
+    with open(filepath, "wb") as f:
+        f.write(b"not a graph")
+    assert cache.get("broken") is None
+    assert not os.path.exists(filepath)
+
+def test_least_recently_used_file_is_evicted(make_grid, tmp_path):
+    cache = DiskGraphCache(str(tmp_path), 1 << 20)
+    cache.put("first", make_grid(8))
+    size = os.path.getsize(cache.filepath("first"))
+    cache.max_bytes = size * 2
+    os.utime(cache.filepath("first"), (1, 1))
+    cache.put("second", make_grid(8, jitter = 0.1))
+    os.utime(cache.filepath("second"), (2, 2))
+    cache.put("third", make_grid(8, jitter = 0.2))
+    assert not os.path.exists(cache.filepath("first"))
+    assert os.path.exists(cache.filepath("second"))
+    assert os.path.exists(cache.filepath("third"))
@@ -0,0 +1,109 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+import itertools
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from PathTool.dual_graph import build_face_graph, shared_pairs
+
+class Collection(list):
+    """Mesh data collection with foreach_get of bpy, vector attributes are flattened"""
+
+    def foreach_get(self, attr, out):
+        values = [getattr(item, attr) for item in self]
+        if values and isinstance(values[0], tuple):
+            values = list(itertools.chain.from_iterable(values))
+        out[:] = values
+
+class Item:
+    def __init__(self, **attrs):
+        self.__dict__.update(attrs)
+
+def grid_mesh(n):
+    """Mesh of n x n quads, face index is j * n + i"""
+    edges = dict()
+
+    def edge_index(a, b):
+        return edges.setdefault((min(a, b), max(a, b)), len(edges))
+
+    polygons, loops = Collection(), Collection()
+    for j in range(n):
+        for i in range(n):
+            v = j * (n + 1) + i
+            verts = (v, v + 1, v + n + 2, v + n + 1)
+            polygons.append(Item(hide = False, loop_start = len(loops), loop_total = 4,
+                                 center = (i + 0.5, j + 0.5, 0.0)))
+            for a, b in zip(verts, verts[1:] + verts[:1]):
+                loops.append(Item(vertex_index = a, edge_index = edge_index(a, b)))
+    return Item(polygons = polygons, loops = loops)
+
+def neighbors(graph, node):
+    return {graph.neighbors[ii]: graph.links[ii]
+            for ii in range(graph.offsets[node], graph.offsets[node + 1])}
+
+@pytest.mark.parametrize("seed", range(5))
+def test_shared_pairs_matches_all_pairs_of_same_key(seed):
+    rng = random.Random(seed)
+    keys = np.array([rng.randrange(8) for _ in range(60)], dtype = np.int32)
+    values = np.array([rng.randrange(20) for _ in range(60)], dtype = np.int32)
+    pairs_a, pairs_b, pair_keys = shared_pairs(keys, values)
+
+    expected = sorted((min(values[x], values[y]), max(values[x], values[y]), keys[x])
+                      for x, y in itertools.combinations(range(len(keys)), 2)
+                      if keys[x] == keys[y] and values[x] != values[y])
+    found = sorted((min(a, b), max(a, b), k) for a, b, k in zip(pairs_a, pairs_b, pair_keys))
+    assert found == expected
+
+def test_shared_pairs_of_empty_input():
+    pairs_a, pairs_b, pair_keys = shared_pairs(np.empty(0, dtype = np.int32), np.empty(0, dtype = np.int32))
+    assert len(pairs_a) == len(pairs_b) == len(pair_keys) == 0
+
+def test_face_graph_by_edges_connects_side_neighbors():
+    n = 4
+    mesh = grid_mesh(n)
+    graph = build_face_graph(mesh, None, "EDGE")
+    assert graph.mode == "faces" and graph.num_nodes == n * n
+    links = neighbors(graph, 1 * n + 1)
+    assert set(links) == {1, 1 * n, 1 * n + 2, 2 * n + 1}
+    assert all(link >= 0 for link in links.values())
+    assert set(neighbors(graph, 0)) == {1, n}
+    assert graph.weights[graph.offsets[0]] == pytest.approx(1.0)
+
+def test_face_graph_by_vertices_links_corners_with_minus_one():
+    n = 4
+    graph = build_face_graph(grid_mesh(n), None, "VERTEX")
+    links = neighbors(graph, 1 * n + 1)
+    assert set(links) == {0, 1, 2, n, n + 2, 2 * n, 2 * n + 1, 2 * n + 2}
+    assert [links[f] for f in (0, 2, 2 * n, 2 * n + 2)] == [-1] * 4
+    assert all(links[f] >= 0 for f in (1, n, n + 2, 2 * n + 1))
+
+def test_hidden_face_is_not_connected():
+    n = 3
+    mesh = grid_mesh(n)
+    mesh.polygons[4].hide = True
+    graph = build_face_graph(mesh, None, "VERTEX")
+    assert neighbors(graph, 4) == {}
+    assert 4 not in neighbors(graph, 1)
+    assert not graph.same_island(0, 4)
+    assert graph.same_island(0, 8)
@@ -0,0 +1,126 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+import random
+
+from array import array
+
+import pytest
+
+from conftest import grid_pairs
+from PathTool.graph import (IndexPath, MeshGraph, PathResult, SegmentCache, astar, bidirectional,
+                            dijkstra, find_path, find_segment, label_islands, segment_cache)
+
+METHODS = (dijkstra, astar, bidirectional)
+
+def path_length(graph, result):
+    """Sum of edge weights along path, checks that path follows graph edges"""
+    length = 0.0
+    for a, b, link in zip(result.nodes, result.nodes[1:], result.links):
+        for ii in range(graph.offsets[a], graph.offsets[a + 1]):
+            if graph.neighbors[ii] == b and graph.links[ii] == link:
+                length += graph.weights[ii]
+                break
+        else:
+            raise AssertionError("%d-%d by link %d is not graph edge" % (a, b, link))
+    return length
+
+@pytest.mark.parametrize("seed", range(5))
+def test_search_methods_find_equal_shortest_paths(make_grid, seed):
+    graph = make_grid(15, 12, jitter = 0.3, seed = seed)
+    rng = random.Random(seed)
+    for _ in range(20):
+        source, target = rng.randrange(graph.num_nodes), rng.randrange(graph.num_nodes)
+        lengths = []
+        for search in METHODS:
+            result = search(graph, source, target)
+            assert result.nodes[0] == source and result.nodes[-1] == target
+            assert len(result.links) == len(result.nodes) - 1
+            lengths.append(path_length(graph, result))
+        assert lengths == pytest.approx([lengths[0]] * len(METHODS))
+
+def test_search_on_straight_grid_counts_manhattan_steps(make_grid):
+    graph = make_grid(10)
+    for search in METHODS:
+        result = search(graph, 0, 99)
+        assert len(result.links) == 18
+
+def test_same_source_and_target(make_grid):
+    graph = make_grid(3)
+    for search in METHODS:
+        result = search(graph, 4, 4)
+        assert result.nodes == [4] and result.links == []
+
+def test_label_islands_smallest_node_is_label():
+    pairs_a, pairs_b, links = grid_pairs(3, 3)
+    more_a, more_b, more_links = grid_pairs(2, 2, offset = 9, link_offset = len(links))
+    coords = array('d', [0.0] * 3 * 14)
+    graph = MeshGraph.from_pairs("edges", coords, pairs_a + more_a, pairs_b + more_b, links + more_links)
+    islands = label_islands(graph)
+    assert list(islands) == [0] * 9 + [9] * 4 + [13]
+    assert graph.same_island(2, 8)
+    assert not graph.same_island(8, 9)
+
+def test_find_path_beetween_islands_is_empty():
+    coords = array('d', [0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 5.0, 0.0, 0.0, 6.0, 0.0, 0.0])
+    graph = MeshGraph.from_pairs("edges", coords, array('i', [0, 2]), array('i', [1, 3]), array('i', [0, 1]))
+    assert find_path(graph, 0, 3).nodes == []
+
+def test_auto_search_with_zero_length_edges():
+    # Stacked vertices, mean edge length is 0
+    coords = array('d', [0.0] * 9)
+    graph = MeshGraph.from_pairs("edges", coords, array('i', [0, 1]), array('i', [1, 2]), array('i', [0, 1]))
+    segment_cache.clear()
+    assert list(find_segment(graph, 0, 2, "AUTO")) == [0, 1]
+
+def test_segment_cache_returns_reversed_segment():
+    cache = SegmentCache(max_size = 2)
+    cache.put(5, 2, "edges", PathResult([5, 4, 2], [7, 8], 0))
+    assert cache.get(2, 5, "edges") == PathResult([2, 4, 5], [8, 7], 0)
+    assert cache.get(5, 2, "edges") == PathResult([5, 4, 2], [7, 8], 0)
+    assert cache.get(5, 2, "faces") is None
+    assert (cache.hits, cache.misses) == (2, 1)
+
+def test_segment_cache_drops_least_recently_used():
+    cache = SegmentCache(max_size = 2)
+    for ii in range(3):
+        cache.put(ii, ii + 10, "edges", PathResult([ii, ii + 10], [ii], 0))
+    assert len(cache) == 2
+    assert cache.get(0, 10, "edges") is None
+    cache.get(1, 11, "edges")
+    cache.resize(1)
+    assert cache.get(1, 11, "edges") is not None
+    assert cache.get(2, 12, "edges") is None
+
+def test_segment_cache_is_cleared_for_other_graph(make_grid):
+    cache = SegmentCache()
+    cache.validate(make_grid(3))
+    cache.put(0, 1, "edges", PathResult([0, 1], [0], 0))
+    cache.validate(make_grid(3))
+    assert len(cache) == 1
+    cache.validate(make_grid(3, jitter = 0.1))
+    assert len(cache) == 0
+
+def test_index_path_keeps_first_order_without_doubles():
+    path = IndexPath(10, [3, 1, 3])
+    path.extend([1, 7])
+    path.add(0)
+    assert list(path) == [3, 1, 7, 0]
+    assert 7 in path and 2 not in path
@@ -0,0 +1,75 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+import random
+
+import pytest
+
+from PathTool.undo_utils import UndoStep, diff_range
+
+def test_diff_range_trims_common_start_and_end():
+    assert diff_range([1, 2, 3, 4], [1, 5, 6, 4], int.__eq__) == (1, 3, 3)
+    assert diff_range([1, 2], [1, 2, 3], int.__eq__) == (2, 2, 3)
+    assert diff_range([1, 1], [1], int.__eq__) == (1, 2, 1)
+    assert diff_range([], [], int.__eq__) == (0, 0, 0)
+
+def random_edit(rng, controls, fills):
+    """Insert, remove or replace control points, fills change with them like in path"""
+    controls, fills = list(controls), list(fills)
+    action = rng.randrange(3)
+    if action == 0 or not controls:
+        index = rng.randrange(len(controls) + 1)
+        controls.insert(index, rng.randrange(100))
+        fills.insert(min(index, len(fills)), [rng.randrange(100)])
+    elif action == 1:
+        index = rng.randrange(len(controls))
+        del controls[index]
+        if fills:
+            del fills[min(index, len(fills) - 1)]
+    else:
+        index = rng.randrange(len(controls))
+        controls[index] = rng.randrange(100)
+        if fills:
+            fills[min(index, len(fills) - 1)] = [rng.randrange(100)]
+    return controls, fills
+
+@pytest.mark.parametrize("seed", range(10))
+def test_steps_redo_and_undo_every_state(seed):
+    rng = random.Random(seed)
+    states = [([], [])]
+    for _ in range(40):
+        states.append(random_edit(rng, *states[-1]))
+    steps = [UndoStep(old[0], new[0], old[1], new[1]) for old, new in zip(states, states[1:])]
+
+    controls, fills = states[-1]
+    for step, state in zip(reversed(steps), reversed(states[:-1])):
+        controls, fills = step.apply(controls, fills, reverse = True)
+        assert (controls, fills) == state
+    for step, state in zip(steps, states[1:]):
+        controls, fills = step.apply(controls, fills)
+        assert (controls, fills) == state
+
+def test_step_keeps_only_changed_range():
+    fill = [1, 2]
+    step = UndoStep([1, 2, 3], [1, 2, 3], [fill], [fill])
+    assert not step
+    step = UndoStep([1, 2, 3, 4], [1, 9, 4], [[0], fill, [5]], [[0], [7], [5]])
+    assert (step.start, step.removed, step.inserted) == (1, [2, 3], [9])
+    assert (step.fill_start, step.removed_fills, step.inserted_fills) == (1, [fill], [[7]])
@@ -0,0 +1,60 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+def diff_range(old, new, same):
+    """Range which differs beetween two sequences after trimming common start and end"""
+    size = min(len(old), len(new))
+    start = 0
+    while start < size and same(old[start], new[start]):
+        start += 1
+    end = 0
+    while end < size - start and same(old[-1 - end], new[-1 - end]):
+        end += 1
+    return start, len(old) - end, len(new) - end
+
+class UndoStep:
+    """Change of control point indices and their segments beetween two registered states"""
+    __slots__ = ("start", "removed", "inserted", "fill_start", "removed_fills", "inserted_fills")
+
+    def __init__(self, old_controls, new_controls, old_fills, new_fills):
+        start, old_end, new_end = diff_range(old_controls, new_controls, int.__eq__)
+        self.start = start
+        self.removed = old_controls[start:old_end]
+        self.inserted = new_controls[start:new_end]
+
+        # Segments are shared with path state, recomputed ones may be equal copies
+        start, old_end, new_end = diff_range(old_fills, new_fills, lambda a, b: a is b or a == b)
+        self.fill_start = start
+        self.removed_fills = old_fills[start:old_end]
+        self.inserted_fills = new_fills[start:new_end]
+
+    def __bool__(self):
+        return bool(self.removed or self.inserted or self.removed_fills or self.inserted_fills)
+
+    def apply(self, controls, fills, reverse = False):
+        """Return's new control indices and segments, reverse for undo"""
+        removed, inserted = self.removed, self.inserted
+        removed_fills, inserted_fills = self.removed_fills, self.inserted_fills
+        if reverse:
+            removed, inserted = inserted, removed
+            removed_fills, inserted_fills = inserted_fills, removed_fills
+        controls = controls[:self.start] + inserted + controls[self.start + len(removed):]
+        fills = fills[:self.fill_start] + inserted_fills + fills[self.fill_start + len(removed_fills):]
+        return controls, fills
@@ -22,25 +22,45 @@ import bpy
 import bmesh
 import mathutils
 import gpu
+import os
+import sys
+import tempfile
 
+from bpy.app.handlers import persistent
+from bpy_extras import view3d_utils
+from mathutils.bvhtree import BVHTree
+
+from array import array
 from collections import deque
-from .draw_utils import (create_batch_control_points, create_batch_path, draw_callback_3d)
+from .draw_utils import (MeshBuffers, create_overlay_batches, path_vertices,
+                         draw_callback_2d, draw_callback_3d)
+from .graph import (IndexPath, find_segment, graph_cache, segment_cache)
+from .api import mesh_graph
+from .disk_cache import DiskGraphCache
+from . import parallel
+from .profiling import (profiled, profiler)
+from .undo_utils import UndoStep
 
 class PathUndo:
     def __init__(self):
-        self.undo_max_steps = 10
+        self.undo_max_steps = getattr(self, "undo_steps", 1000)
         self.undo_history = deque(maxlen = self.undo_max_steps)  # undo history
         self.redo_history = deque(maxlen = self.undo_max_steps)  # redo history
+        # Last registered state, steps are stored as changes of it
+        self.undo_controls = array('i')
+        self.undo_fills = list()
 
     def undo(self, context):
-        if len(self.undo_history) == 1:
-            self.cancel(context)
-            return {'CANCELLED'}
-        if len(self.undo_history) > 1:
-            step = self.undo_history.pop()
+        if len(self.undo_history) > 0:
+            step = self.undo_history[-1]
+            if len(self.undo_controls) - len(step.inserted) + len(step.removed) == 0:
+                # Undo of first control point
+                self.cancel(context)
+                return {'CANCELLED'}
+            self.undo_history.pop()
             self.redo_history.append(step)
-            self.control_elements = self.undo_history[-1].copy()
-            self.full_path_update()
+            self.undo_controls, self.undo_fills = step.apply(self.undo_controls, self.undo_fills, True)
+            self.restore_undo_state()
         else:
             self.report({'WARNING'}, message = "Can't undo anymore")
 
@@ -50,15 +70,40 @@ class PathUndo:
         if len(self.redo_history) > 0:
             step = self.redo_history.pop()
             self.undo_history.append(step)
-            self.control_elements = self.undo_history[-1].copy()
-            self.full_path_update()
+            self.undo_controls, self.undo_fills = step.apply(self.undo_controls, self.undo_fills)
+            self.restore_undo_state()
         else:
             self.report({'WARNING'}, message = "Can't redo anymore")
 
     def register_undo_step(self):
-        step = self.control_elements.copy()
-        self.undo_history.append(step)
-        self.redo_history.clear()
+        controls = array('i', (elem.index for elem in self.control_elements))
+        fills = list(self.fill_elements)
+        step = UndoStep(self.undo_controls, controls, self.undo_fills, fills)
+        if step:
+            self.undo_history.append(step)
+            self.redo_history.clear()
+        self.undo_controls = controls
+        self.undo_fills = fills
+
+    def restore_undo_state(self):
+        """Set path to last registered state, segments stored in history are reused"""
+        elems = self.bm.verts if self.mesh_elements == "edges" else self.bm.faces
+        old_fills = self.fill_elements
+        self.control_elements = [elems[ii] for ii in self.undo_controls]
+        self.fill_elements = list(self.undo_fills)
+        self.index_control_elements()
+
+        # Only segments changed by step need their points indexed again
+        old_ids = set(map(id, old_fills))
+        new_ids = set(map(id, self.fill_elements))
+        for fill in old_fills:
+            if id(fill) not in new_ids:
+                self.unindex_fill(fill)
+        for fill in self.fill_elements:
+            if id(fill) not in old_ids:
+                self.index_fill(fill)
+        self.update_fill_path()
+        self.dirty_batches = True
 
 class PathUtils:
     """Utilits for needed for path selection"""
@@ -96,25 +141,46 @@ class PathUtils:
         for attr in ("mark_select", "mark_seam", "mark_sharp"):
             setattr(self, attr, getattr(tool_props, attr))
 
-        for attr in ("batch_cp_faces", "batch_cp_verts", "batch_path",
-                     "drag_element", "drag_element_index",
+        self.reset_path_state()
+        self.shader = gpu.shader.from_builtin('3D_SMOOTH_COLOR')
+        self.load_preferences()
+
+    def reset_path_state(self):
+        """Empty path, batches and update flags"""
+        for attr in ("batch_path", "batch_points",
+                     "drag_element", "drag_element_index", "drag_timer",
+                     "drag_pending", "drag_location",
                      "mouse_press", "mouse_remove", "drag"):
             setattr(self, attr, None)
-        for attr in ("control_elements", "fill_elements",
-                     "path_indices", "fill_gap_path"):
+        for attr in ("control_elements", "fill_elements"):
             setattr(self, attr, list())
+        self.fill_gap_path = array('i')
+        self.path_indices = None
+        self.segment_vertices = dict()
+        self.draw_time = 0.0
+        self.draw_calls = 0
+        self.control_positions = dict()
+        self.control_doubles = set()
+        self.fill_points_index = dict()
+        self.fill_positions = dict()
 
         self.fill_gap = False
-        self.original_select = self.selected_elements
-        self.shader = gpu.shader.from_builtin('3D_SMOOTH_COLOR')
+        for attr in ("dirty_path", "dirty_batches", "dirty_redraw"):
+            setattr(self, attr, False)
 
+    def load_preferences(self):
+        """Read colors, sizes and search settings from add-on preferences"""
         addon = "PathTool"
         addons = bpy.context.preferences.addons
         if addon in addons:
             prefs = addons[addon].preferences
             for attr in ("color_active", "color_control_point",
                          "color_fill", "color_face_center",
-                         "vertex_size", "edge_width"):
+                         "vertex_size", "edge_width", "path_search",
+                         "segment_cache_size", "undo_steps",
+                         "profiling", "profiling_file",
+                         "disk_cache", "disk_cache_dir", "disk_cache_size",
+                         "segment_workers", "face_connectivity"):
                 setattr(self, attr, getattr(prefs, attr))
         else:
             self.color_active = (1.0, 0.7, 0.0, 1.0)
@@ -124,25 +190,98 @@ class PathUtils:
 
             self.vertex_size = 4.0
             self.edge_width = 3.0
+            self.path_search = "AUTO"
+            self.segment_cache_size = 256
+            self.undo_steps = 1000
+            self.profiling = False
+            self.profiling_file = ""
+            self.disk_cache = False
+            self.disk_cache_dir = ""
+            self.disk_cache_size = 2048
+            self.segment_workers = 1
+            self.face_connectivity = "EDGE"
+        segment_cache.resize(self.segment_cache_size)
+        profiler.enable(self.profiling)
 
     def register_handlers(self, args, context):
         context.window_manager.modal_handler_add(self)
         handle = bpy.types.SpaceView3D.draw_handler_add(draw_callback_3d,
                                                         args, 'WINDOW', 'POST_VIEW')
         self.draw_handle_3d = handle
+        self.draw_handle_2d = None
+        if self.profiling:
+            self.draw_handle_2d = bpy.types.SpaceView3D.draw_handler_add(draw_callback_2d,
+                                                                         args, 'WINDOW', 'POST_PIXEL')
 
     def unregister_handlers(self, context):
+        self.remove_drag_timer(context)
         bpy.types.SpaceView3D.draw_handler_remove(self.draw_handle_3d, 'WINDOW')
         context.workspace.status_text_set(None)
         self.draw_handle_3d = None
+        if self.draw_handle_2d:
+            bpy.types.SpaceView3D.draw_handler_remove(self.draw_handle_2d, 'WINDOW')
+            self.draw_handle_2d = None
+        if self.profiling:
+            self.export_timings()
+
+    def export_timings(self):
+        """Write timings of session to profiling file, temp directory by default"""
+        filepath = bpy.path.abspath(self.profiling_file)
+        if not filepath:
+            filepath = os.path.join(tempfile.gettempdir(), "path_tool_timings.json")
+        try:
+            profiler.export(filepath)
+        except OSError as ex:
+            self.report({'WARNING'}, message = "Timings not exported: %s" % ex)
 
     def create_bmesh(self, context):
         """Create bmesh from object"""
         mesh = context.edit_object.data
+        self.mesh = mesh
+        self.mesh_key = mesh.as_pointer()
         self.bm = bmesh.from_edit_mesh(mesh)
         for n in (self.bm.verts, self.bm.edges, self.bm.faces):
             n.ensure_lookup_table()
 
+    def create_graph(self):
+        """Build path search graph for current mesh elements mode, reused while mesh is not changed"""
+        # Mesh arrays are synced with edit mesh by create_buffers
+        self.graph = mesh_graph(self.mesh, self.bm, self.mesh_elements, self.face_connectivity,
+                                self.disk_graph_cache(), self.buffers)
+
+    def disk_graph_cache(self):
+        """On disk graph cache from preferences: cache dir, or folder next to .blend, or temp dir"""
+        if not self.disk_cache:
+            return None
+        directory = bpy.path.abspath(self.disk_cache_dir)
+        if not directory:
+            if bpy.data.filepath:
+                directory = os.path.join(os.path.dirname(bpy.data.filepath), "path_tool_cache")
+            else:
+                directory = os.path.join(tempfile.gettempdir(), "path_tool_cache")
+        return DiskGraphCache(directory, self.disk_cache_size * 1024 * 1024)
+
+    def create_buffers(self, context):
+        """Gather mesh arrays used to build overlay batches and fingerprint of mesh state"""
+        obj = context.edit_object
+        obj.update_from_editmode()
+        self.buffers = MeshBuffers(obj.data)
+        self.mesh_fingerprint = self.buffers.fingerprint()
+
+    def create_bvh(self):
+        """
+        Build BVH tree over triangles of visible faces for picking, reused while mesh is not changed.
+        Hidden faces are left out, so rays pass through them
+        """
+        key = (self.mesh_key, "bvh")
+        entry = graph_cache.get(key, self.mesh_fingerprint)
+        if entry is None:
+            tris, tri_faces = self.buffers.visible_triangles()
+            bvh = BVHTree.FromPolygons(self.buffers.co.tolist(), tris.tolist(), all_triangles = True)
+            entry = (bvh, tri_faces)
+            graph_cache.put(key, self.mesh_fingerprint, entry)
+        self.bvh, self.bvh_faces = entry
+
     def update_mesh(self, context):
         """Update context editmesh and selection"""
         self.bm.select_flush_mode()
@@ -150,99 +289,159 @@ class PathUtils:
         context.scene.tool_settings.mesh_select_mode = self.mesh_mode
 
     def get_element_by_mouse(self, context, event):
+        """Get element under mouse of given event"""
+        mloc = (event.mouse_region_x, event.mouse_region_y)
+        return self.get_element_by_location(context, mloc)
+
+    @profiled("pick")
+    def get_element_by_location(self, context, mloc):
         """
-        Get element by mouse. First selected element define which
+        Get element by region location. First picked element define which
         part of mesh can contain next control points
         Return's: for face mode - face, for edge mode - vertex
         """
-        context.scene.tool_settings.mesh_select_mode = self.select_mode
-        #
-        mloc = (event.mouse_region_x, event.mouse_region_y)
-        ret = bpy.ops.view3d.select(location = mloc)
-        elem = None
-        if 'FINISHED' in ret:
-            elem = self.bm.select_history.active
-            if len(self.control_elements) == 0:
-                bpy.ops.mesh.select_linked(delimit = {'NORMAL'})
-                if self.mesh_elements == "faces":
-                    self.path_on_indices = [n.index for n
-                                            in self.selected_elements]
-                elif self.mesh_elements == "edges":
-                    self.path_on_indices = [n.index for n
-                                            in [v for v in self.bm.verts if v.select == True]]
-                self.deselect_all()
-            if elem:
-                elem.select_set(False)
-
-        context.scene.tool_settings.mesh_select_mode = self.mesh_mode
+        elem = self.ray_cast_element(context, mloc)
+        if elem and len(self.control_elements) == 0:
+            self.island = self.graph.islands[elem.index]
 
         if elem != None:
-            if elem.index in self.path_on_indices:
+            if self.graph.islands[elem.index] == self.island:
                 return elem
             else:
                 self.report({'INFO'},
                             message = "Can't make path on another part of mesh")
 
+    def ray_cast_element(self, context, mloc):
+        """
+        Cast ray from region location to mesh without changing selection.
+        Return's: for face mode - hit face, for edge mode - nearest vertex of hit face
+        """
+        region = context.region
+        rv3d = context.region_data
+        origin = view3d_utils.region_2d_to_origin_3d(region, rv3d, mloc)
+        direction = view3d_utils.region_2d_to_vector_3d(region, rv3d, mloc)
+
+        matrix_inv = context.edit_object.matrix_world.inverted()
+        origin = matrix_inv @ origin
+        direction = (matrix_inv.to_3x3() @ direction).normalized()
+
+        location, normal, index, distance = self.bvh.ray_cast(origin, direction)
+        if index is None:
+            return None
+
+        face = self.bm.faces[self.bvh_faces[index]]
+        if self.mesh_elements == "faces":
+            return face
+        elif self.mesh_elements == "edges":
+            return min(face.verts, key = lambda v: (v.co - location).length_squared)
+
     def switch_direction(self):
         """Reverse direction of lists and redraw"""
         self.control_elements.reverse()
         self.fill_elements.reverse()
-        self.create_batches()
+        self.index_control_elements()
+        self.dirty_batches = True
+
+    def add_drag_timer(self, context):
+        """Timer which processes only latest mouse location while drag"""
+        wm = context.window_manager
+        self.drag_timer = wm.event_timer_add(1.0 / 60.0, window = context.window)
+
+    def remove_drag_timer(self, context):
+        if self.drag_timer:
+            context.window_manager.event_timer_remove(self.drag_timer)
+            self.drag_timer = None
+
+    def queue_drag(self, event):
+        """Remember latest mouse location, previous unprocessed ones are dropped"""
+        self.drag_pending = (event.mouse_region_x, event.mouse_region_y)
+
+    def process_drag(self, context):
+        """Move dragged control point to latest queued mouse location"""
+        mloc = self.drag_pending
+        self.drag_pending = None
+        if mloc is None or mloc == self.drag_location:
+            return
+        self.drag_location = mloc
+        elem = self.get_element_by_location(context, mloc)
+        if elem:
+            self.drag_element_by_mouse(elem)
 
     def drag_element_by_mouse(self, elem):
         """Called when drag"""
-        if self.drag_element:
-            if self.drag_element in self.control_elements:
-                ii = self.control_elements.index(self.drag_element)
-                if self.drag_element_index != None:
-                    self.control_elements[self.drag_element_index] = elem
-
         if self.drag_element == None:
             self.drag_element = elem
-            if self.drag_element in self.control_elements:
-                self.drag_element_index = self.control_elements.index(elem)
+            if elem.index in self.control_positions:
+                self.drag_element_index = self.control_positions[elem.index][0]
+            return
 
-        elif self.drag_element != elem:
-            self.drag_element = elem
+        if elem == self.drag_element or self.drag_element_index == None:
+            return
+
+        self.drag_element = elem
+        self.set_control_element(self.drag_element_index, elem)
+        self.update_by_element(self.drag_element_index)
 
-        if self.drag_element_index != None:
-            self.update_by_element(self.drag_element_index)
+    def end_drag(self, context):
+        """Called when dragged control point released"""
+        if self.drag_pending:
+            self.process_drag(context)
+        self.remove_drag_timer(context)
+        self.drag = False
+        self.drag_location = None
 
     def on_click(self, elem, remove = False):
         """Called when user clicked on mesh"""
         if remove == False:
-            if not elem in self.control_elements:
-                if elem in self.fill_points:
-                    ii = self.get_fillelements_index(elem)
+            if not elem.index in self.control_positions:
+                ii = self.get_fillelements_index(elem)
+                if ii is not None:
                     self.control_elements.insert(ii + 1, elem)
-                    self.fill_elements.insert(ii, [])  # play with ii+/-1
+                    self.fill_elements.insert(ii, array('i'))  # play with ii+/-1
+                    self.index_control_elements()
+                    ii += 1
                 else:
                     self.control_elements.append(elem)
                     if len(self.control_elements) > 1:
-                        self.fill_elements.append([])
+                        self.fill_elements.append(array('i'))
                     ii = len(self.control_elements) - 1
+                    self.control_positions[elem.index] = [ii]
                 self.update_by_element(ii)
         else:
             self.remove_element(elem)
 
     def remove_element(self, elem):
         """Removing control point"""
-        if elem in self.control_elements:
-            self.control_elements.remove(elem)
+        if elem.index in self.control_positions:
+            del self.control_elements[self.control_positions[elem.index][0]]
             self.full_path_update()
 
+    @profiled("full update")
     def full_path_update(self):
-        """`Update path from every second control point"""
-        self.fill_elements = [[] for n in range(len(self.control_elements) - 1)]
-        for ii in list(range(len(self.control_elements)))[::2]:
-            self.update_by_element(ii)
-        self.set_selection(self.original_select)
+        """Update all segments of path, searches are shared beetween worker processes on large meshes"""
+        controls = self.control_elements
+        pairs = [(p1.index, p2.index) for p1, p2 in zip(controls, controls[1:])]
+        # Blender before 2.92 has own binary as sys.executable
+        executable = getattr(bpy.app, "binary_path_python", sys.executable)
+        self.fill_elements = parallel.find_segments(self.graph, pairs, self.path_search,
+                                                    self.segment_workers, executable)
+        self.index_control_elements()
+        self.fill_points_index = dict()
+        for fill in self.fill_elements:
+            self.index_fill(fill)
+        self.update_fill_path()
+        self.dirty_batches = True
 
+    @profiled("update")
     def update_by_element(self, elem_ind):
         """Update path from and to element by given index"""
+        self.update_segments(elem_ind)
+        self.dirty_batches = True
+
+    def update_segments(self, elem_ind):
+        """Update only segments next to element by given index"""
         ll = len(self.control_elements)
         if ((elem_ind > (ll - 1)) or (ll < 2)):
-            self.create_batches()
             return
         elem = self.control_elements[elem_ind]
 
@@ -260,33 +459,24 @@ class PathUtils:
 
         for pair in pairs:
             p1, p2, fii = pair
+            old_fill = self.fill_elements[fii]
+            self.unindex_fill(old_fill)
+            self.fill_positions.pop(id(old_fill), None)
             if p1 == p2:
-                self.fill_elements[fii] = list()
-                continue
-
-            fill = self.update_path_beetween_two(p1, p2)
+                fill = array('i')
+            else:
+                fill = self.update_path_beetween_two(p1, p2)
             self.fill_elements[fii] = fill
-            bpy.context.scene.tool_settings.mesh_select_mode = self.mesh_mode
+            self.fill_positions[id(fill)] = fii
+            self.index_fill(fill)
 
-        self.update_fill_path()
-
-        self.create_batches()
+        # Fill gap depends only on first and last control points
+        if elem_ind in (0, ll - 1) or not self.fill_gap_path:
+            self.update_fill_path()
 
     def update_path_beetween_two(self, p1, p2):
-        """Update path by 2 given control points"""
-        bpy.context.scene.tool_settings.mesh_select_mode = self.select_mode
-        self.deselect_all()
-        self.set_selection((p1, p2), True)
-        bpy.ops.mesh.shortest_path_select()
-        self.set_selection((p1, p2), False)
-        fill = self.selected_elements
-        self.deselect_all()
-        if self.mesh_elements == "edges":
-            if fill == []:  # Exception if control points in one edge
-                for edge in p1.link_edges:
-                    if edge.other_vert(p1) == p2:
-                        fill = list([edge])
-        return fill
+        """Update path by 2 given control points, return's indices of path elements"""
+        return find_segment(self.graph, p1.index, p2.index, self.path_search)
 
     def update_fill_path(self):
         """Update fill path as separate part"""
@@ -297,97 +487,99 @@ class PathUtils:
                 fill = self.update_path_beetween_two(p1, p2)
                 if len(fill) > 0:
                     self.fill_gap_path = fill
-            bpy.context.scene.tool_settings.mesh_select_mode = self.mesh_mode
 
         else:
-            self.fill_gap_path = list()
-
-    def deselect_all(self):
-        """Deselect all"""
-        bpy.ops.mesh.select_all(action = 'DESELECT')
-
-    def set_selection(self, elements, status = True):
-        """Set selection status of elements in given list to given status"""
-        for elem in elements:
-            elem.select_set(status)
-
-    @property
-    def fills(self):
-        fills = []
-        for n in self.fill_elements:
-            for elem in n:
-                fills.append(elem)
-        fills += self.fill_gap_path
-        return fills
+            self.fill_gap_path = array('i')
+
+    def index_control_elements(self):
+        """Rebuild index from control element to its positions, and from segment to its position"""
+        self.fill_positions = {id(fill): ii for ii, fill in enumerate(self.fill_elements)}
+        self.control_positions = dict()
+        self.control_doubles = set()
+        for ii, elem in enumerate(self.control_elements):
+            positions = self.control_positions.setdefault(elem.index, [])
+            positions.append(ii)
+            if len(positions) > 1:
+                self.control_doubles.add(elem.index)
+
+    def set_control_element(self, ii, elem):
+        """Replace control point at given position, keeping index up to date"""
+        old = self.control_elements[ii].index
+        positions = self.control_positions[old]
+        positions.remove(ii)
+        if not positions:
+            del self.control_positions[old]
+        if len(positions) < 2:
+            self.control_doubles.discard(old)
+
+        self.control_elements[ii] = elem
+        positions = self.control_positions.setdefault(elem.index, [])
+        positions.append(ii)
+        positions.sort()
+        if len(positions) > 1:
+            self.control_doubles.add(elem.index)
+
+    def fill_points(self, fill):
+        """Indices of points of given fill: vertices of edges, or faces"""
+        if self.mesh_elements == "edges":
+            edges = self.bm.edges
+            return {v.index for ii in fill for v in edges[ii].verts}
+        return set(fill)
+
+    def index_fill(self, fill):
+        """
+        Remember every segment passing through points of given fill.
+        Point maps id of segment to number of its uses in path
+        """
+        index = self.fill_points_index
+        key = id(fill)
+        for point in self.fill_points(fill):
+            segments = index.setdefault(point, dict())
+            segments[key] = segments.get(key, 0) + 1
+
+    def unindex_fill(self, fill):
+        """Forget given fill which is replaced or removed from path"""
+        index = self.fill_points_index
+        key = id(fill)
+        for point in self.fill_points(fill):
+            segments = index.get(point)
+            if segments is None or key not in segments:
+                continue
+            segments[key] -= 1
+            if segments[key] == 0:
+                del segments[key]
+                if not segments:
+                    del index[point]
 
     def get_fillelements_index(self, elem):
-        """Return's index in fills of given element"""
-        if self.mesh_elements == "edges":
-            for fill in self.fill_elements:
-                for edge in fill:
-                    if elem in edge.verts:
-                        ind = self.fill_elements.index(fill)
-                        return ind
-        elif self.mesh_elements in ("verts", "faces"):
-            for fill in self.fill_elements:
-                for n in fill:
-                    if elem == n:
-                        ind = self.fill_elements.index(fill)
-                        return ind
-
-    @property
-    def fill_points(self):
-        """List of points in all fills"""
-        fills = []
-        if self.mesh_elements == "edges":
-            for elem in self.fill_elements:
-                for edge in elem:
-                    for v in edge.verts:
-                        fills.append(v)
-        elif self.mesh_elements in ("verts", "faces"):
-            for n in self.fill_elements:
-                for elem in n:
-                    fills.append(elem)
-        return fills
-
-    @property
-    def selected_elements(self):
-        """Selected elements"""
-        return [n for n in getattr(self.bm, self.mesh_elements) if n.select == True]
+        """Return's index in fills of first segment passing through given element"""
+        segments = self.fill_points_index.get(elem.index)
+        if not segments:
+            return None
+        return min(self.fill_positions[key] for key in segments)
 
     def prepare_for_execute(self, context):
         """Write path elements indices to property"""
         self.confirm_path = False
-        final_list = self.control_elements + self.fills + self.fill_gap_path
-        path = self.get_path()
-        for elem in path:
-            ii = elem.index
-            if not ii in self.path_indices:
-                self.path_indices.append(ii)
-
-        self.set_selection(self.original_select)
+        self.path_indices = self.get_path()
         self.update_mesh(context)
 
     def get_path(self):
-        path = []
-        pl = self.fill_elements + [self.fill_gap_path]
+        """Indices of all path elements without doubles"""
+        path = IndexPath(len(getattr(self.bm, self.mesh_elements)))
+        for fill in self.fill_elements:
+            path.extend(fill)
+        path.extend(self.fill_gap_path)
         if self.mesh_elements == "faces":
-            pl.extend([self.control_elements])
-        for n in pl:
-            for elem in n:
-                if not elem in path:
-                    path.append(elem)
+            path.extend(elem.index for elem in self.control_elements)
         return path
 
     def check_doubles(self, context):
         """Check doubles in control points"""
-        for n in range(len(self.control_elements) - 1):
-            dou = []
-            for ii in range(len(self.control_elements)):
-                if self.control_elements[ii] == self.control_elements[n]:
-                    dou.append(ii)
-            if len(dou) > 1:
-                p1, p2 = dou
+        for elem_index in list(self.control_doubles):
+            positions = self.control_positions.get(elem_index, ())
+            if len(positions) > 1:
+                p1, p2 = positions[:2]
                 ll = len(self.control_elements) - 1
 
                 if (p1 == 0 and p2 == ll) and self.fill_gap == False and ll > 2:
@@ -404,14 +596,56 @@ class PathUtils:
                     self.report({'INFO'},
                                 message = "You should not duplicate control points, undo")
 
+    def update_dirty(self, context):
+        """Update only what was changed by last event"""
+        if self.dirty_path:
+            self.dirty_path = False
+            self.update_fill_path()
+            self.dirty_batches = True
+        if self.dirty_batches:
+            self.dirty_batches = False
+            self.create_batches()
+            self.dirty_redraw = True
+        if self.dirty_redraw:
+            self.dirty_redraw = False
+            if context.area:
+                context.area.tag_redraw()
+
+    @profiled("batches")
     def create_batches(self):
-        path = self.get_path()
-        create_batch_path(self, path)
-        create_batch_control_points(self)
+        """Create merged overlay batches, vertex arrays of segments are rebuilt only for changed segments"""
+        create_overlay_batches(self, self.path_vertex_arrays())
+
+    def path_vertex_arrays(self):
+        """Vertex arrays of all path segments, with fill gap"""
+        segment_vertices = dict()
+        parts = [self.segment_vertex_arrays(segment_vertices, ii, ii + 1, fill)
+                 for ii, fill in enumerate(self.fill_elements)]
+        parts.append(self.segment_vertex_arrays(segment_vertices, 0, -1, self.fill_gap_path))
+        self.segment_vertices = segment_vertices
+        return [part for part in parts if part]
+
+    def segment_vertex_arrays(self, segment_vertices, ii, jj, fill):
+        """Vertex arrays of segment beetween control points by given indices, reused while segment not changed"""
+        if not fill:
+            return None
+        p1 = self.control_elements[ii].index
+        p2 = self.control_elements[jj].index
+        key = (min(p1, p2), max(p1, p2))
+        entry = self.segment_vertices.get(key)
+        if entry is None or (entry[0] != fill and entry[0] != fill[::-1]):
+            entry = (fill, path_vertices(self, fill))
+        segment_vertices[key] = entry
+        return entry[1]
 
     def cancel(self, context):
         """Cancel"""
-        self.deselect_all()
-        self.set_selection(self.original_select, True)
         self.update_mesh(context)
         self.unregister_handlers(context)
+
+@persistent
+def clear_caches(*args):
+    """Forget cached graphs and segments, mesh pointers are not valid in loaded file"""
+    graph_cache.clear()
+    segment_cache.clear()
+    parallel.shutdown()
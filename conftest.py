@@ -0,0 +1,25 @@
+# <pep8 compliant>
+
+"""
+Add-on folder is Blender package, its __init__ imports bpy.
+Collect it as plain directory and register it as "PathTool" package without running __init__,
+so tests can import modules which don't need Blender.
+
+    python -m pytest
+"""
+
+import os
+import sys
+import types
+
+import pytest
+
+ADDON_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "PathTool 1.0.5")
+
+package = types.ModuleType("PathTool")
+package.__path__ = [ADDON_DIR]
+sys.modules.setdefault("PathTool", package)
+
+def pytest_collect_directory(path, parent):
+    if str(path) == ADDON_DIR:
+        return pytest.Dir.from_parent(parent, path = path)